@@ -0,0 +1,244 @@
+"""Benchmarks for pairings, standings and tournament detail serialization.
+
+Builds synthetic tournaments in a throwaway test database, plays N rounds with
+random results and reports wall time, query count and peak memory per stage.
+
+Usage:
+    python -m benchmarks.pairings --sizes 8 64 512 4096 --json bench.json
+    python -m benchmarks.pairings --sizes 512 --compare bench.json
+
+Peak memory is measured with tracemalloc, which slows Python code down, so
+compare wall times only between runs of this script.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime
+from math import ceil, log
+from random import choice, seed
+from time import perf_counter
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+
+from event_organizer.models import (  # noqa: E402
+    Player, Tournament, TournamentPlayers, Match, PlayerStanding)
+from event_organizer.pairing_view import tournament_pairings  # noqa: E402
+from event_organizer.serializers import TournamentDetailSerializer  # noqa: E402
+from tests.fixtures import gen_tournament  # noqa: E402
+
+DEFAULT_SIZES = [8, 64, 512, 4096]
+
+# player_1_score, player_2_score, draws
+RESULTS = [(2, 0, 0), (2, 1, 0), (0, 2, 0), (1, 2, 0), (1, 1, 1)]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func):
+    counter = QueryCounter()
+    tracemalloc.start()
+    start = perf_counter()
+    with connection.execute_wrapper(counter):
+        func()
+    wall_time = perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'wall_time': round(wall_time, 6),
+        'queries': counter.count,
+        'peak_memory': peak_memory,
+    }
+
+
+def create_tournament(size):
+    tournament = gen_tournament(
+        name=f'benchmark {size}',
+        date_beginning='2019-01-01T10:00:00Z',
+        date_ending='2019-01-01T20:00:00Z',
+    )
+    # bcrypt is slow on purpose, so all players share one hash
+    password = make_password('benchmark1')
+    Player.objects.bulk_create([
+        Player(
+            first_name='Player',
+            last_name=str(i),
+            email=f'bench{size}-{i}@benchmark.test',
+            _password=password,
+        )
+        for i in range(size)
+    ])
+    players = Player.objects.filter(email__startswith=f'bench{size}-')
+    TournamentPlayers.objects.bulk_create([
+        TournamentPlayers(tournament=tournament, player=player)
+        for player in players
+    ])
+    tournament.update_rounds_number(number=None)
+    return tournament
+
+
+def play_round(tournament, round_num):
+    # a handful of UPDATEs instead of one per match
+    matches = Match.objects.filter(
+        tournament=tournament, round=round_num, player_2__isnull=False)
+    match_ids_by_result = {}
+    for match_id in matches.values_list('id', flat=True):
+        match_ids_by_result.setdefault(choice(RESULTS), []).append(match_id)
+    for (score_1, score_2, draws), match_ids in match_ids_by_result.items():
+        Match.objects.filter(id__in=match_ids).update(
+            player_1_score=score_1, player_2_score=score_2, draws=draws)
+    # queryset updates skip Match.save, which keeps the standings and the
+    # round state
+    PlayerStanding.rebuild(tournament)
+    Tournament.rebuild_round_state(tournament.id)
+    tournament.refresh_from_db(fields=Tournament.ROUND_STATE_FIELDS)
+
+
+def run_size(size, rounds, strategy):
+    request_factory = RequestFactory()
+    results = []
+
+    def record(stage, round_num, measurement):
+        measurement.update(size=size, stage=stage, round=round_num)
+        results.append(measurement)
+        print(format_row(measurement), flush=True)
+
+    tournament = None
+
+    def setup():
+        nonlocal tournament
+        tournament = create_tournament(size)
+
+    record('setup', None, measure(setup))
+    rounds = rounds or max(ceil(log(size, 2)), 1)
+
+    for round_num in range(1, rounds + 1):
+        request = request_factory.get(
+            f'/events/tournaments/{tournament.id}/pairings/',
+            {'strategy': strategy}
+        )
+        record('pairings', round_num, measure(
+            lambda: tournament_pairings(request, tournament.id)))
+        play_round(tournament, round_num)
+
+    def standings():
+        Tournament.objects.get(id=tournament.id).standings
+
+    def detail():
+        TournamentDetailSerializer(
+            Tournament.objects.get(id=tournament.id)).data
+
+    record('standings', None, measure(standings))
+    record('detail_serializer', None, measure(detail))
+    return results
+
+
+def format_row(row):
+    round_num = row['round'] if row['round'] is not None else '-'
+    return (
+        f"{row['size']:>6} {row['stage']:<18} {round_num:>5} "
+        f"{row['wall_time']:>11.4f} {row['queries']:>8} "
+        f"{row['peak_memory'] / 1024 / 1024:>10.2f}"
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    baseline_rows = {
+        (row['size'], row['stage'], row['round']): row
+        for row in baseline['results']
+    }
+    print(f"\nCompared with {baseline_path} "
+          f"(commit {baseline['meta'].get('commit')})")
+    print(f"{'size':>6} {'stage':<18} {'round':>5} "
+          f"{'time ratio':>11} {'queries +/-':>12}")
+    for row in results:
+        old = baseline_rows.get((row['size'], row['stage'], row['round']))
+        if not old:
+            continue
+        ratio = row['wall_time'] / old['wall_time'] if old['wall_time'] else 0
+        round_num = row['round'] if row['round'] is not None else '-'
+        print(f"{row['size']:>6} {row['stage']:<18} {round_num:>5} "
+              f"{ratio:>11.2f} {row['queries'] - old['queries']:>+12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+        help='numbers of players in the synthetic tournaments')
+    parser.add_argument(
+        '--rounds', type=int, default=None,
+        help='rounds to play (default: as many as the tournament has)')
+    parser.add_argument(
+        '--strategy', default='weighted', help='pairing strategy to use')
+    parser.add_argument(
+        '--seed', type=int, default=0, help='seed for random results')
+    parser.add_argument(
+        '--json', dest='json_path', help='write results to this JSON file')
+    parser.add_argument(
+        '--compare', dest='compare_path',
+        help='JSON file of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    seed(args.seed)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        print(f"{'size':>6} {'stage':<18} {'round':>5} "
+              f"{'wall time s':>11} {'queries':>8} {'peak MiB':>10}")
+        results = []
+        for size in args.sizes:
+            results += run_size(size, args.rounds, args.strategy)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    if args.json_path:
+        output = {
+            'meta': {
+                'commit': git_commit(),
+                'created_at': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'strategy': args.strategy,
+                'seed': args.seed,
+            },
+            'results': results,
+        }
+        with open(args.json_path, 'w') as json_file:
+            json.dump(output, json_file, indent=2)
+
+    if args.compare_path:
+        compare(results, args.compare_path)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
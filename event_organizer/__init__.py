@@ -1,5 +1,11 @@
 from django.apps import AppConfig
 
+default_app_config = 'event_organizer.EventOrganizerConfig'
+
 
 class EventOrganizerConfig(AppConfig):
     name = 'event_organizer'
+
+    def ready(self):
+        from event_organizer.tokens import check_revocation_cache
+        check_revocation_cache()
@@ -1,6 +1,14 @@
 import functools
+import logging
+from django.conf import settings
 from django.http import HttpResponse
-from event_organizer.models import Token
+from django.views.decorators.http import condition
+from event_organizer.hashing import HashingBusy
+from event_organizer.models import Token, Tournament
+from event_organizer.tokens import (
+    is_signed_token, token_cache, verify_signed_token)
+
+logger = logging.getLogger(__name__)
 
 
 def uppercase(func):
@@ -13,24 +21,71 @@ def uppercase(func):
 def is_authorized(func):
     @functools.wraps(func)
     def wrapper(request, *args, **kwargs):
+        result = request.META.get('HTTP_AUTHORIZATION')
+        if not result:
+            return HttpResponse(status=400)
         try:
-            result = request.META.get('HTTP_AUTHORIZATION')
-            if not result:
-                return HttpResponse(status=400)
-            print(result)
-            result_split = result.split(':')
-            if not result_split:
-                return HttpResponse(status=400)
-            player_id = result_split[0]
-            uuid = result_split[1]
-            token = Token.objects.get(uuid=uuid)
-            print(token)
-            if token.player_id != int(player_id):
-                print('bad id player')
+            player_id, uuid = result.split(':', 1)
+            player_id = int(player_id)
+        except ValueError:
+            return HttpResponse(status=400)
+
+        mode = settings.AUTH_TOKEN_MODE
+        if is_signed_token(uuid):
+            if mode == 'table':
+                return HttpResponse(status=401)
+            # checked without the database
+            if verify_signed_token(uuid) != player_id:
                 return HttpResponse(status=401)
-        except Token.DoesNotExist:
-            print('token doesnt exist')
+            return func(request, *args, **kwargs)
+        if mode == 'signed_only':
+            return HttpResponse(status=401)
+
+        cached = token_cache.get(uuid)
+        if cached is None:
+            # indexed lookup of the token
+            token = Token.objects.filter(uuid=uuid).values_list(
+                'player_id', 'is_expired').first()
+            if token is None:
+                logger.debug('token doesnt exist')
+                return HttpResponse(status=401)
+            token_cache.set(uuid, *token)
+            cached = token
+
+        token_player_id, is_expired = cached
+        if is_expired:
+            logger.debug('token expired')
+            return HttpResponse(status=401)
+        if token_player_id != player_id:
+            logger.debug('bad id player')
             return HttpResponse(status=401)
 
         return func(request, *args, **kwargs)
     return wrapper
+
+
+def hashing_backpressure(func):
+    # Views hashing passwords answer 429 while the hashing pool is full
+    @functools.wraps(func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return func(request, *args, **kwargs)
+        except HashingBusy:
+            response = HttpResponse(status=429)
+            response['Retry-After'] = settings.PASSWORD_HASHING_RETRY_AFTER
+            return response
+    return wrapper
+
+
+def tournament_etag(request, *args, **kwargs):
+    # One primary key lookup; views with a matching If-None-Match don't run,
+    # the others find the version in request.tournament_version
+    tournament_id = kwargs.get('tournament_id', kwargs.get('id'))
+    version = Tournament.current_version(tournament_id)
+    request.tournament_version = version
+    if version is None:
+        return None
+    return f'{tournament_id}-{version}'
+
+
+tournament_condition = condition(etag_func=tournament_etag)
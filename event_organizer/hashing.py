@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from random import randrange
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class HashingBusy(Exception):
+    """ All shared hashing slots are taken, or all threads of the hashing
+    pool are busy and its queue is full. """
+
+
+class SharedSlots:
+    """ Semaphore shared by all processes using the same cache: `size` cache
+    keys, each held by one hashing call. A slot of a process that died
+    frees itself after `timeout` seconds.
+    With prefork servers every process handles one request at a time, so
+    only this limit (and not HashingPool's threads) can turn a login storm
+    into 429s; it needs a cache shared by the processes, e.g. memcached.
+    Args:
+        size - default PASSWORD_HASHING_SLOTS; 0 disables the limit
+        alias - default PASSWORD_HASHING_CACHE
+        timeout - default PASSWORD_HASHING_SLOT_TIMEOUT
+    """
+
+    def __init__(self, size=None, alias=None, timeout=None):
+        self._size = size
+        self._alias = alias
+        self._timeout = timeout
+
+    @property
+    def size(self):
+        if self._size is None:
+            return settings.PASSWORD_HASHING_SLOTS
+        return self._size
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.PASSWORD_HASHING_CACHE]
+
+    @property
+    def timeout(self):
+        return self._timeout or settings.PASSWORD_HASHING_SLOT_TIMEOUT
+
+    def acquire(self):
+        # Returns (key, owner) of a free slot, None if the limit is disabled;
+        # raises HashingBusy when all slots are taken
+        size = self.size
+        if not size:
+            return None
+        owner = uuid4().hex
+        first = randrange(size)  # spreads processes over the slots
+        for i in range(size):
+            key = f'password-hashing-slot:{(first + i) % size}'
+            if self.cache.add(key, owner, self.timeout):
+                return key, owner
+        raise HashingBusy()
+
+    def release(self, slot):
+        if slot is None:
+            return
+        key, owner = slot
+        # the slot may have expired and been taken by someone else
+        if self.cache.get(key) == owner:
+            self.cache.delete(key)
+
+
+class HashingPool:
+    """ Bounded pool running password hashing and verification, so a burst
+    of logins can't take more than `threads` CPUs of a process; calls beyond
+    `threads` running and `queue` waiting ones raise HashingBusy at once
+    instead of piling up on the workers. This limit only fills up with
+    threaded workers (e.g. gunicorn --threads); shared_slots is the limit
+    for all processes.
+    Args:
+        threads - default PASSWORD_HASHING_THREADS; 0 hashes in the calling
+            thread without any limit (the original behaviour)
+        queue - default PASSWORD_HASHING_QUEUE
+        shared_slots - SharedSlots limiting hashing calls of all processes
+    """
+
+    def __init__(self, threads=None, queue=None, shared_slots=None):
+        self._threads = threads
+        self._queue = queue
+        self.shared_slots = shared_slots or SharedSlots()
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def threads(self):
+        if self._threads is None:
+            return settings.PASSWORD_HASHING_THREADS
+        return self._threads
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            return settings.PASSWORD_HASHING_QUEUE
+        return self._queue
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                self._slots = threading.BoundedSemaphore(
+                    self.threads + self.queue)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.threads,
+                    thread_name_prefix='password-hashing')
+        return self._executor, self._slots
+
+    def submit(self, func, *args):
+        executor, slots = self._start()
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+
+        def run():
+            # released before the result is set, so the slot is free
+            # for whoever waits on it
+            try:
+                return func(*args)
+            finally:
+                slots.release()
+
+        try:
+            return executor.submit(run)
+        except BaseException:
+            slots.release()
+            raise
+
+    def run(self, func, *args):
+        slot = self.shared_slots.acquire()
+        try:
+            if not self.threads:
+                return func(*args)
+            return self.submit(func, *args).result()
+        finally:
+            self.shared_slots.release(slot)
+
+
+hashing_pool = HashingPool()
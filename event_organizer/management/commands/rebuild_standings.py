@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from event_organizer.models import Tournament, PlayerStanding
+
+
+class Command(BaseCommand):
+    help = 'Recomputes stored standings from the matches of tournaments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tournament_ids', nargs='*', type=int,
+            help='Tournaments to rebuild (default: all of them).')
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.all()
+        if options['tournament_ids']:
+            tournaments = tournaments.filter(id__in=options['tournament_ids'])
+
+        for tournament in tournaments:
+            PlayerStanding.rebuild(tournament)
+            self.stdout.write(f'Rebuilt standings of {tournament}')
@@ -0,0 +1,32 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from event_organizer.pairing_view import claim_pairing_job, run_pairing_job
+
+
+class Command(BaseCommand):
+    help = 'Runs queued pairing jobs (PAIRING_JOBS_MODE = "worker").'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when there are no queued jobs left.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait before checking for new jobs again.')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_pairing_job()
+            if job is None:
+                if options['once']:
+                    return
+                sleep(options['poll_interval'])
+                continue
+
+            run_pairing_job(job)
+            job.refresh_from_db()
+            self.stdout.write(
+                f'Pairing job {job.id} (tournament {job.tournament_id}): '
+                f'{job.status}')
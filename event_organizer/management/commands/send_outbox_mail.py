@@ -0,0 +1,37 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from player_services.outbox import OutboxSender
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbox mail over one reused SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when there is no due mail left.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds to wait before checking for new mail again.')
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Mails claimed at a time (default: MAIL_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        sender = OutboxSender(batch_size=options['batch_size'])
+        try:
+            while True:
+                sent, failed = sender.send_batch()
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} mails, {failed} failed')
+                    continue
+
+                # don't keep the connection open while there's nothing to send
+                sender.close()
+                if options['once']:
+                    return
+                sleep(options['poll_interval'])
+        finally:
+            sender.close()
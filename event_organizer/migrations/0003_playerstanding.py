@@ -0,0 +1,87 @@
+# Generated by Django 2.1.3 on 2026-10-18 09:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copy of the scoring rules of event_organizer.scores at the time of this
+# migration, so later changes there don't change what it does
+def result_totals(own_score, opponent_score, draws):
+    if not (own_score or opponent_score or draws):
+        return None
+    if own_score > opponent_score:
+        points = 3
+    elif own_score == opponent_score and (draws > 0 or own_score > 0):
+        points = 1
+    else:
+        points = 0
+    return {
+        'points': points,
+        'wins': int(own_score > opponent_score),
+        'losses': int(own_score < opponent_score),
+        'draws': int(own_score == opponent_score),
+        'games_won': own_score,
+        'games_lost': opponent_score,
+        'games_drawn': draws,
+    }
+
+
+def fill_standings(apps, schema_editor):
+    Match = apps.get_model('event_organizer', 'Match')
+    PlayerStanding = apps.get_model('event_organizer', 'PlayerStanding')
+
+    standings = {}
+    matches = Match.objects.order_by().values_list(
+        'tournament_id', 'player_1_id', 'player_2_id', 'player_1_score',
+        'player_2_score', 'draws')
+    for (tournament_id, player_1_id, player_2_id, player_1_score,
+            player_2_score, draws) in matches.iterator():
+        sides = [(player_1_id, player_2_id, player_1_score, player_2_score)]
+        if player_2_id is not None:  # player_1 had a bye
+            sides.append(
+                (player_2_id, player_1_id, player_2_score, player_1_score))
+        for player_id, opponent_id, own_score, opponent_score in sides:
+            key = (tournament_id, player_id)
+            if key not in standings:
+                standings[key] = PlayerStanding(
+                    tournament_id=tournament_id, player_id=player_id)
+            standing = standings[key]
+            totals = result_totals(own_score, opponent_score, draws)
+            if totals is None:
+                continue
+            for field, value in totals.items():
+                setattr(standing, field, getattr(standing, field) + value)
+            if opponent_id is not None:
+                standing.opponents = ','.join(
+                    filter(None, [standing.opponents, str(opponent_id)]))
+    PlayerStanding.objects.bulk_create(standings.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_organizer', '0002_pairingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStanding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('draws', models.IntegerField(default=0)),
+                ('games_won', models.IntegerField(default=0)),
+                ('games_lost', models.IntegerField(default=0)),
+                ('games_drawn', models.IntegerField(default=0)),
+                ('opponents', models.TextField(blank=True, default='')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='event_organizer.Player')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='player_standings', to='event_organizer.Tournament')),
+            ],
+            options={
+                'unique_together': {('tournament', 'player')},
+            },
+        ),
+        migrations.RunPython(fill_standings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.1.3 on 2026-10-18 09:42
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_round_state(apps, schema_editor):
+    Tournament = apps.get_model('event_organizer', 'Tournament')
+    for tournament in Tournament.objects.all():
+        matches = tournament.matches.order_by()
+        last_round = matches.aggregate(Max('round'))['round__max'] or 0
+        tournament.last_round = last_round
+        tournament.unfinished_matches = matches.filter(
+            round=last_round, player_1_score=0, player_2_score=0, draws=0
+        ).count()
+        tournament.save(update_fields=['last_round', 'unfinished_matches'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_organizer', '0003_playerstanding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='last_round',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='unfinished_matches',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_round_state, migrations.RunPython.noop),
+    ]
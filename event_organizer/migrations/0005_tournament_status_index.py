@@ -0,0 +1,17 @@
+# Generated by Django 2.1.3 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_organizer', '0004_tournament_round_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['unfinished_matches', 'last_round', 'rounds_number'], name='tournament_status_idx'),
+        ),
+    ]
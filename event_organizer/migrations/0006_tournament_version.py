@@ -0,0 +1,18 @@
+# Generated by Django 2.1.3 on 2026-10-18 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_organizer', '0005_tournament_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
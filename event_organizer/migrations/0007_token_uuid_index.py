@@ -0,0 +1,19 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:03
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_organizer', '0006_tournament_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='token',
+            name='uuid',
+            field=models.CharField(db_index=True, default=uuid.uuid4, max_length=200),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.1.3 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # Only the newest queued or running job of a tournament is kept active,
+    # so the unique index below can be created
+    PairingJob = apps.get_model('event_organizer', 'PairingJob')
+    active = PairingJob.objects.filter(
+        status__in=('queued', 'running')).order_by('tournament_id', '-id')
+    kept = set()
+    duplicates = []
+    for job_id, tournament_id in active.values_list('id', 'tournament_id'):
+        if tournament_id in kept:
+            duplicates.append(job_id)
+        kept.add(tournament_id)
+    PairingJob.objects.filter(id__in=duplicates).update(
+        status='failed', error='Duplicate pairing job')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_organizer', '0008_outboxmail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pairingjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            fail_duplicate_active_jobs, migrations.RunPython.noop),
+        # At most one queued or running job per tournament (partial index,
+        # supported by PostgreSQL and SQLite)
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX pairing_job_active_uniq "
+            "ON event_organizer_pairingjob (tournament_id) "
+            "WHERE status IN ('queued', 'running')",
+            "DROP INDEX pairing_job_active_uniq",
+        ),
+    ]
@@ -1,10 +1,25 @@
-from datetime import datetime, timezone
+import json
+from datetime import datetime, timedelta, timezone
 from math import ceil, log
 from uuid import uuid4
 
+from django.conf import settings
 from django.contrib.auth.hashers import check_password, make_password
-from django.db.models import Q, Max
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import (
+    Q, Max, F, Case, Count, Exists, FilteredRelation, OuterRef, Prefetch, Subquery,
+    Value, When)
+from django.db.models.functions import Coalesce, Greatest
+from django.db import models, transaction
+from django.utils import timezone as django_timezone
+
+from event_organizer.hashing import hashing_pool
+from event_organizer.pairing_engine import OpponentIndex
+from event_organizer.scores import (
+    MATCH_FIELDS, ScoreSnapshot, match_sides, result_totals,
+    standings_from_totals)
+from event_organizer.tournament_cache import delete_payloads
+from event_organizer.tournament_state import TournamentState
 
 
 class Player(models.Model):
@@ -20,12 +35,28 @@ class Player(models.Model):
     email = models.EmailField(max_length=254, blank=False, unique=True)
     _password = models.CharField(max_length=255, blank=False)  # hashed
 
+    # Both hash on hashing_pool and raise HashingBusy when it's saturated
     def check_password(self, password_plaintext):
-        return check_password(password_plaintext, self._password)
+        return hashing_pool.run(
+            check_password, password_plaintext, self._password)
+
+    def delete(self, *args, **kwargs):
+        # Matches of the player are cascade-deleted without Match.delete, so
+        # round state and standings of their tournaments are recomputed
+        with transaction.atomic():
+            tournaments = list(Tournament.objects.filter(
+                matches__in=Match.objects.filter(
+                    Q(player_1=self) | Q(player_2=self))
+            ).distinct())
+            deleted = super().delete(*args, **kwargs)
+            for tournament in tournaments:
+                Tournament.rebuild_round_state(tournament.id)
+                PlayerStanding.rebuild(tournament)
+        return deleted
 
     # TODO: Add validation when creating player
     def set_password(self, password_plaintext):
-        password_hashed = make_password(password_plaintext)
+        password_hashed = hashing_pool.run(make_password, password_plaintext)
         self._password = password_hashed
         self.save()
 
@@ -81,20 +112,70 @@ class Player(models.Model):
     def get_current_tournaments(self):
         # return list of tours objects that are ongoing and that the player
         # takes part in
-        tournaments = Tournament.objects.filter(players__id=self.id).all()
-        current_tours = [t for t in tournaments if not t.is_finished]
-        return current_tours
+        # one query for matches of all of them, with players for the names
+        return list(Tournament.objects.filter(
+            players__id=self.id
+        ).current().prefetch_related(Prefetch(
+            'matches',
+            queryset=Match.objects.select_related('player_1', 'player_2')
+        )))
+
+    def tournament_scores(self):
+        # {tournament_id: points} of every tournament with a finished match
+        return dict(self.standings.values_list('tournament_id', 'points'))
 
     def get_player_history(self):
-        tournaments_all = Tournament.objects.filter(
-            players__id=self.id).all()
-        tournaments_finished = [t for t in tournaments_all if t.past_rounds]
-        return tournaments_finished
+        # tournaments with at least one past round
+        return Tournament.objects.filter(
+            players__id=self.id).with_past_rounds()
 
     def __str__(self):
         return "%s %s" % (self.first_name, self.last_name)
 
 
+class TournamentQuerySet(models.QuerySet):
+    """ Filters on the stored round state of tournaments (see
+    Tournament.update_round_state), no matches are queried.
+    """
+    # same condition as Tournament.is_finished
+    FINISHED = Q(unfinished_matches=0, last_round__gte=F('rounds_number'))
+
+    def finished(self):
+        return self.filter(self.FINISHED)
+
+    def ongoing(self):
+        return self.filter(last_round__gt=0).exclude(self.FINISHED)
+
+    def upcoming(self):
+        # no round was paired yet
+        return self.filter(last_round=0).exclude(self.FINISHED)
+
+    def current(self):
+        # upcoming and ongoing
+        return self.exclude(self.FINISHED)
+
+    def with_past_rounds(self):
+        # same condition as Tournament.past_rounds not being empty: the last
+        # round is finished or an earlier round exists
+        earlier_matches = Match.objects.filter(
+            tournament=OuterRef('pk'), round__lt=OuterRef('last_round'))
+        return self.annotate(
+            has_earlier_rounds=Exists(earlier_matches)
+        ).filter(
+            Q(unfinished_matches=0, last_round__gt=0) |
+            Q(has_earlier_rounds=True)
+        )
+
+    def with_status(self, status):
+        return getattr(self, status)()
+
+    def bump_version(self):
+        # for changes that don't go through Match.save, e.g. players
+        tournament_ids = list(self.values_list('id', flat=True))
+        Tournament.objects.filter(id__in=tournament_ids).update(
+            version=F('version') + 1)
+
+
 class Tournament(models.Model):
     """ Model containing four basic informations about game tournaments.
     Args:
@@ -113,26 +194,80 @@ class Tournament(models.Model):
         related_name='tournaments'
     )
     rounds_number = models.IntegerField(blank=False, default=1)
+    # Round state kept up to date by Match.save and Match.delete
+    last_round = models.IntegerField(default=0)
+    unfinished_matches = models.IntegerField(default=0)
+    # Bumped with every change of the tournament, its matches or players;
+    # used as ETag of tournament responses
+    version = models.PositiveIntegerField(default=0)
+
+    ROUND_STATE_FIELDS = ('last_round', 'unfinished_matches', 'version')
+
+    UPCOMING = 'upcoming'
+    ONGOING = 'ongoing'
+    FINISHED = 'finished'
+    STATUSES = (UPCOMING, ONGOING, FINISHED)
+
+    objects = TournamentQuerySet.as_manager()
 
     class Meta:
         ordering = ('date_beginning',)
+        indexes = [
+            models.Index(
+                fields=['unfinished_matches', 'last_round', 'rounds_number'],
+                name='tournament_status_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Round state is only written by matches, so a copy of it loaded
+        # before they changed can't overwrite it
+        if (self.pk is not None and kwargs.get('update_fields') is None and
+                not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.name not in self.ROUND_STATE_FIELDS
+            ] + ['version']
+            self.version = F('version') + 1
+            super().save(*args, **kwargs)
+            self.refresh_from_db(fields=['version'])
+        else:
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        tournament_id = self.id
+        version = self.current_version(tournament_id)
+        deleted = super().delete(*args, **kwargs)
+        if version is not None:
+            delete_payloads(tournament_id, version)
+        return deleted
+
+    @classmethod
+    def current_version(cls, tournament_id):
+        # Primary key lookup; None if the tournament doesn't exist
+        return cls.objects.filter(id=tournament_id).values_list(
+            'version', flat=True).first()
+
+    # not _state, Django keeps its own ModelState there
+    _tournament_state = None
+
+    def state(self):
+        # Matches and players loaded once per instance (i.e. per request)
+        if self._tournament_state is None:
+            self._tournament_state = TournamentState(self)
+        return self._tournament_state
+
+    def invalidate_state(self):
+        # Called whenever matches or players of the tournament change
+        self._tournament_state = None
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.invalidate_state()
+        super().refresh_from_db(*args, **kwargs)
 
     @property
     def current_round(self):
-        # No pairings were generated yet
-        if not self.matches.all():
-            return []
-        else:
-            max_round = self.matches.aggregate(Max('round'))['round__max']
-            current_round_matches = self.matches.filter(round=max_round)
-            in_play_matches = []
-            for match in current_round_matches:
-                if not match.is_finished:
-                    in_play_matches.append(match)
-            if in_play_matches:
-                return current_round_matches
-            else:
-                return self.matches.filter(round=(max_round + 1))
+        return self.state().current_round
 
     @property
     def current_round_number(self):
@@ -141,10 +276,7 @@ class Tournament(models.Model):
 
     @property
     def is_current_round_finished(self):
-        for match in self.current_round:
-            if not match.is_finished:
-                return False
-        return True
+        return not self.unfinished_matches
 
     @property
     def is_finished(self):
@@ -155,59 +287,136 @@ class Tournament(models.Model):
 
     @property
     def past_rounds(self):
-        if self.is_current_round_finished:
-            max_round = self.round_number_next
-        else:
-            max_round = self.matches.aggregate(Max('round'))['round__max']
-        past_round_matches = self.matches.exclude(round=max_round)
-        return past_round_matches
+        return self.state().past_rounds
 
     @property
     def past_round_pairings(self):
         past_round_matches = self.past_rounds
         list_pairings = [
             [match.player_1_id, match.player_2_id]
-            for match in past_round_matches.all()
+            for match in past_round_matches
         ]
         return list_pairings
 
     @property
     def round_number_next(self):
-        round = 1
-        if not self.matches.all():
-            pass
-        elif self.is_current_round_finished:
-            round += self.matches.aggregate(Max('round'))['round__max']
+        if self.is_current_round_finished:
+            return self.last_round + 1
+        return self.last_round
+
+    @classmethod
+    def update_round_state(cls, tournament_id, changes):
+        """ Applies changes of matches to the round state of a tournament and
+        bumps its version.
+        Args:
+            changes - list of (old, new) tuples, both (round, is_finished) of
+                a match or None for a match that doesn't exist
+        """
+        changes = [(old, new) for old, new in changes if old != new]
+        tournaments = cls.objects.filter(id=tournament_id)
+        version = F('version') + 1
+
+        if not changes:
+            # e.g. a score was corrected, the match stays finished
+            tournaments.update(version=version)
+        elif all(old is None for old, new in changes):
+            # New matches only count if they are in the last round
+            new_round = max(new[0] for old, new in changes)
+            unfinished = sum(
+                1 for old, (round, finished) in changes
+                if round == new_round and not finished)
+            tournaments.update(
+                unfinished_matches=Case(
+                    When(last_round__lt=new_round, then=Value(unfinished)),
+                    When(
+                        last_round=new_round,
+                        then=F('unfinished_matches') + unfinished),
+                    default=F('unfinished_matches'),
+                ),
+                last_round=Greatest('last_round', Value(new_round)),
+                version=version,
+            )
+        elif all(old is not None and new is not None and old[0] == new[0]
+                 for old, new in changes):
+            # Scores submitted; rounds of the matches didn't change
+            for old, new in changes:
+                tournaments.update(
+                    unfinished_matches=Case(
+                        When(
+                            last_round=new[0],
+                            then=(F('unfinished_matches') +
+                                  int(old[1]) - int(new[1]))),
+                        default=F('unfinished_matches'),
+                    ),
+                    version=version,
+                )
         else:
-            return self.matches.aggregate(Max('round'))['round__max']
-        return round
+            cls.rebuild_round_state(tournament_id)
+
+    @classmethod
+    def rebuild_round_state(cls, tournament_id):
+        # Recomputes round state from the matches, e.g. after a match was
+        # deleted or matches were changed with a queryset update, and bumps
+        # the version
+        matches = Match.objects.filter(
+            tournament=OuterRef('pk')).order_by().values('tournament')
+        tournaments = cls.objects.filter(id=tournament_id)
+        tournaments.update(last_round=Coalesce(Subquery(
+            matches.annotate(last=Max('round')).values('last')), 0))
+        tournaments.update(
+            unfinished_matches=Coalesce(Subquery(
+                matches.filter(
+                    round=OuterRef('last_round'), player_1_score=0,
+                    player_2_score=0, draws=0
+                ).annotate(unfinished=Count('id')).values('unfinished')), 0),
+            version=F('version') + 1,
+        )
 
     @property
     def standings(self):
-        players = self.players.all()
-        scores = []
-        for player in players:
-            player_score = player.get_score_in_tournament(self.id)
-            scores.append({
-                "id": player.id,
-                "first_name": player.first_name,
-                "last_name": player.last_name,
-                "score": player_score
-
-                # TODO: Add tiebreakers
-            })
-        scores.sort(key=lambda x: x["score"], reverse=True)
-        for i in range(len(scores)):
-            scores[i]["order"] = i + 1
-        return scores
+        # Single query: tournament players joined with their stored totals
+        rows = self.players.annotate(
+            standing=FilteredRelation(
+                'standings', condition=Q(standings__tournament=self))
+        ).values(
+            'id', 'first_name', 'last_name',
+            points=F('standing__points'),
+            wins=F('standing__wins'),
+            losses=F('standing__losses'),
+            draws=F('standing__draws'),
+            games_won=F('standing__games_won'),
+            games_lost=F('standing__games_lost'),
+            games_drawn=F('standing__games_drawn'),
+            opponents=F('standing__opponents'),
+        )
+        return standings_from_totals(list(rows))
 
     def __str__(self):
         return "%s" % (self.name)
 
     def score_by_player_id(self, player_id):
-        player = Player.objects.get(id=player_id)
-        player_score = player.get_score_in_tournament(self.id)
-        return player_score
+        points = self.player_standings.filter(
+            player_id=player_id).values_list('points', flat=True).first()
+        return points or 0
+
+    _opponent_index = None
+
+    def opponent_index(self):
+        # Built with one query on first use; generate_matches adds new rounds
+        if self._opponent_index is None:
+            self._opponent_index = OpponentIndex(
+                self.matches.order_by().values_list(
+                    'player_1_id', 'player_2_id'))
+        return self._opponent_index
+
+    def record_pairings(self, pairings):
+        # Keeps an already loaded opponent index up to date with a new round
+        if self._opponent_index is not None:
+            self._opponent_index.add_pairings(pairings)
+
+    def score_snapshot(self):
+        # Scores of all players, loaded with a single query
+        return ScoreSnapshot.for_tournament(self)
 
     def update_rounds_number(self, number=None):
         # number is value to override the number of rounds if we want to play
@@ -269,6 +478,84 @@ class Match(models.Model):
     class Meta:
         ordering = ('round',)
 
+    @classmethod
+    def save_all(cls, matches):
+        # Saves new matches with a single INSERT, updating standings and
+        # round state as save()
+        with transaction.atomic():
+            cls.objects.bulk_create(matches)
+            tournament_ids = {match.tournament_id for match in matches}
+            for tournament_id in tournament_ids:
+                tournament_matches = [
+                    match for match in matches
+                    if match.tournament_id == tournament_id
+                ]
+                PlayerStanding.update_results(tournament_id, [
+                    (None, match.result) for match in tournament_matches])
+                Tournament.update_round_state(tournament_id, [
+                    (None, match.round_state) for match in tournament_matches])
+        cls._refresh_tournaments(matches)
+        return matches
+
+    def save(self, *args, **kwargs):
+        # Standings and round state are updated in the same transaction as
+        # the match
+        with transaction.atomic():
+            saved_result, saved_round_state = self._locked_state()
+            changed = (saved_result, saved_round_state) != (
+                self.result, self.round_state)
+            super().save(*args, **kwargs)
+            if changed:
+                PlayerStanding.update_result(
+                    self.tournament_id, saved_result, self.result)
+                Tournament.update_round_state(
+                    self.tournament_id,
+                    [(saved_round_state, self.round_state)])
+        self._refresh_tournaments([self])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            saved_result, saved_round_state = self._locked_state()
+            deleted = super().delete(*args, **kwargs)
+            PlayerStanding.update_result(
+                self.tournament_id, saved_result, None)
+            Tournament.update_round_state(
+                self.tournament_id, [(saved_round_state, None)])
+        self._refresh_tournaments([self])
+        return deleted
+
+    def _locked_state(self):
+        # Result and round state of the stored row, locked until the
+        # transaction ends; another copy of the match may have been saved
+        # since this one was loaded. (None, None) if the match isn't stored.
+        if self.pk is None:
+            return None, None
+        row = Match.objects.select_for_update().filter(pk=self.pk).values_list(
+            'round', *MATCH_FIELDS).first()
+        if row is None:
+            return None, None
+        round, *result = row
+        return tuple(result), (round, any(result[2:]))
+
+    @classmethod
+    def _refresh_tournaments(cls, matches):
+        # Tournament instances already loaded with the matches get their new
+        # round state
+        tournaments = {
+            id(match.tournament): match.tournament for match in matches
+            if cls.tournament.is_cached(match)
+        }
+        for tournament in tournaments.values():
+            tournament.refresh_from_db(fields=Tournament.ROUND_STATE_FIELDS)
+
+    @property
+    def result(self):
+        return tuple(getattr(self, field) for field in MATCH_FIELDS)
+
+    @property
+    def round_state(self):
+        return (self.round, bool(self.is_finished))
+
     # TODO: Move to player model; add tests
     def get_player_matches(self, player):
         player_matches_all = Match.objects.filter(
@@ -299,10 +586,195 @@ class Match(models.Model):
         return self.player_1_score or self.player_2_score or self.draws
 
 
+class PlayerStanding(models.Model):
+    """ Totals of a player in a tournament, updated with every change of the
+    tournament's matches (see Match.save).
+    Args:
+        tournament - related Tournament instance
+        player - related Player instance
+        points - integer
+        wins, losses, draws - integers; numbers of finished matches
+        games_won, games_lost, games_drawn - integers
+        opponents - string; comma separated ids of opponents, one per match
+    """
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name='player_standings')
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name='standings')
+    points = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    games_won = models.IntegerField(default=0)
+    games_lost = models.IntegerField(default=0)
+    games_drawn = models.IntegerField(default=0)
+    opponents = models.TextField(blank=True, default='')
+
+    class Meta:
+        unique_together = ('tournament', 'player')
+
+    def add_result(self, opponent_id, own_score, opponent_score, draws,
+                   sign=1):
+        # sign=-1 takes back a result added before
+        totals = result_totals(own_score, opponent_score, draws)
+        if totals is None:
+            return
+        for field, value in totals.items():
+            setattr(self, field, getattr(self, field) + sign * value)
+        if opponent_id is not None:
+            opponent_ids = self.opponents.split(',') if self.opponents else []
+            if sign > 0:
+                opponent_ids.append(str(opponent_id))
+            elif str(opponent_id) in opponent_ids:
+                opponent_ids.remove(str(opponent_id))
+            self.opponents = ','.join(opponent_ids)
+
+    @classmethod
+    def update_result(cls, tournament_id, old_result, new_result):
+        """ Applies the difference between two results of a match (tuples in
+        MATCH_FIELDS order, None for a match that doesn't exist).
+        """
+        cls.update_results(tournament_id, [(old_result, new_result)])
+
+    @classmethod
+    def update_results(cls, tournament_id, changes):
+        # Same as update_result for many matches; standings are read with
+        # one query and the missing ones are created with one INSERT
+        sides = []
+        for old_result, new_result in changes:
+            if old_result == new_result:
+                continue
+            if old_result is not None:
+                sides += [(side, -1) for side in match_sides(*old_result)]
+            if new_result is not None:
+                sides += [(side, 1) for side in match_sides(*new_result)]
+        sides = [
+            (side, sign) for side, sign in sides
+            if result_totals(*side[2:]) is not None
+        ]
+        if not sides:
+            return
+
+        player_ids = {side[0] for side, sign in sides}
+        standings = {
+            standing.player_id: standing
+            for standing in cls.objects.select_for_update().filter(
+                tournament_id=tournament_id, player_id__in=player_ids)
+        }
+        new_standings = {
+            player_id: cls(tournament_id=tournament_id, player_id=player_id)
+            for player_id in player_ids if player_id not in standings
+        }
+        for (player_id, *result), sign in sides:
+            standing = standings.get(player_id) or new_standings[player_id]
+            standing.add_result(*result, sign=sign)
+
+        for standing in standings.values():
+            standing.save()
+        cls.objects.bulk_create(new_standings.values())
+
+    @classmethod
+    def rebuild(cls, tournament):
+        # Recomputes standings of the tournament from its matches
+        standings = {}
+        for result in tournament.matches.order_by().values_list(*MATCH_FIELDS):
+            for player_id, *side in match_sides(*result):
+                if player_id not in standings:
+                    standings[player_id] = cls(
+                        tournament_id=tournament.id, player_id=player_id)
+                standings[player_id].add_result(*side)
+        with transaction.atomic():
+            cls.objects.filter(tournament_id=tournament.id).delete()
+            cls.objects.bulk_create(standings.values())
+            Tournament.objects.filter(id=tournament.id).bump_version()
+
+
+class PairingJob(models.Model):
+    """ Pairings of the next round generated outside of the HTTP request.
+    Args:
+        tournament - related Tournament instance
+        strategy - string; key of pairing_view.PAIRING_STRATEGIES
+        status - one of queued, running, finished, failed
+        progress - integer; percent of work done
+        result - JSON of TournamentPairingsSerializer when finished
+        error - string; reason of failure
+        heartbeat_at - datetime; last sign of life of a running job
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (FINISHED, 'finished'),
+        (FAILED, 'failed'),
+    )
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name='pairing_jobs')
+    strategy = models.CharField(max_length=50)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    result = models.TextField(blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=django_timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def result_data(self):
+        return json.loads(self.result) if self.result else None
+
+    def start(self):
+        self.status = self.RUNNING
+        self.started_at = self.heartbeat_at = django_timezone.now()
+        self.save()
+
+    def set_progress(self, progress):
+        self.progress = progress
+        self.heartbeat_at = django_timezone.now()
+        PairingJob.objects.filter(id=self.id).update(
+            progress=progress, heartbeat_at=self.heartbeat_at)
+
+    @classmethod
+    def fail_stale(cls, **filters):
+        # Running jobs without a heartbeat for PAIRING_JOB_TIMEOUT seconds
+        # belong to a thread or worker that died, and queued jobs that old
+        # were lost with the process whose executor had them (thread mode)
+        # or wait for workers that don't run; they'd block the tournament
+        # forever otherwise
+        deadline = django_timezone.now() - timedelta(
+            seconds=settings.PAIRING_JOB_TIMEOUT)
+        return cls.objects.filter(
+            Q(status=cls.RUNNING, heartbeat_at__lt=deadline) |
+            Q(status=cls.QUEUED, created_at__lt=deadline),
+            **filters
+        ).update(
+            status=cls.FAILED, error='Pairing job timed out',
+            finished_at=django_timezone.now())
+
+    def finish(self, result):
+        self.status = self.FINISHED
+        self.progress = 100
+        self.result = json.dumps(result, cls=DjangoJSONEncoder)
+        self.finished_at = django_timezone.now()
+        self.save()
+
+    def fail(self, error):
+        self.status = self.FAILED
+        self.error = error
+        self.finished_at = django_timezone.now()
+        self.save()
+
+
 class Token(models.Model):
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     created_at = models.DateTimeField(default=datetime.now, blank=True)
-    uuid = models.CharField(max_length=200, default=uuid4)
+    uuid = models.CharField(max_length=200, default=uuid4, db_index=True)
     is_expired = models.BooleanField(default=False)
 
     # This is an example of a FactoryMethod design pattern
@@ -335,3 +807,43 @@ class CreateAccountToken(models.Model):
     def is_valid(self):
         timedelta = datetime.now(timezone.utc) - self.created_at
         return timedelta.days < 1 and not self.was_used
+
+
+class OutboxMail(models.Model):
+    """ Mail queued by player_services.services and delivered outside of the
+    HTTP request by `manage.py send_outbox_mail`.
+    Args:
+        to_email - string; max length 254 chars
+        subject - string; max length 255 chars
+        body - plain text
+        status - one of queued, sent, failed
+        attempts - integer; delivery attempts so far
+        send_after - datetime; next attempt isn't made before it
+        error - string; reason of the last failure
+    """
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'queued'),
+        (SENT, 'sent'),
+        (FAILED, 'failed'),
+    )
+
+    to_email = models.EmailField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    send_after = models.DateTimeField(default=django_timezone.now)
+    created_at = models.DateTimeField(default=django_timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # due mails are read by the sender in this order
+            models.Index(
+                fields=['status', 'send_after'], name='outbox_due_idx'),
+        ]
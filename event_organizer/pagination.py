@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.http import JsonResponse
+
+
+def is_paginated(request):
+    return (
+        settings.PAGINATE_LISTS or
+        'after' in request.GET or
+        'limit' in request.GET
+    )
+
+
+def keyset_page(request, queryset, serializer_class):
+    """ One page of the queryset, ordered by id.
+    Rows with id greater than ?after= are returned, at most ?limit= of them,
+    so a page costs one indexed lookup however deep the client goes.
+    Returns JsonResponse: {"results": [...], "next": url of the next page or
+    null}, or 400 for invalid parameters.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = int(request.GET.get('limit', settings.PAGE_SIZE))
+    except ValueError:
+        return JsonResponse(
+            {'error': 'after and limit must be integers'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+    limit = min(limit, settings.MAX_PAGE_SIZE)
+
+    # one row more tells if there is a next page
+    rows = list(queryset.order_by('id').filter(id__gt=after)[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query['after'] = rows[-1].id
+        query['limit'] = limit
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{query.urlencode()}')
+
+    serializer = serializer_class(rows, many=True)
+    return JsonResponse({'results': serializer.data, 'next': next_url})
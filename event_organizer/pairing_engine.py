@@ -0,0 +1,129 @@
+from random import shuffle
+
+import networkx as nx
+
+
+# Players are matched in blocks of this many (sorted by score) so the blossom
+# algorithm, which is cubic in the number of nodes, stays fast for big events.
+BLOCK_SIZE = 64
+
+# Extra node used when a block has an odd number of players. In the last block
+# the player matched with it gets the bye, in any other block they float down
+# to the next one.
+LEFTOVER = 'leftover'
+
+
+class OpponentIndex:
+    """ Opponents every player already met in a tournament.
+    Args:
+        pairings - iterable of pairs, e.g. [[1, 5], [3, None]] where None
+            means the player had a bye
+    """
+
+    def __init__(self, pairings=()):
+        self.opponents = {}
+        self.add_pairings(pairings)
+
+    def add_pairings(self, pairings):
+        for pair in pairings:
+            player_a = pair[0]
+            player_b = pair[1] if len(pair) > 1 else None
+            self.opponents.setdefault(player_a, set()).add(player_b)
+            if player_b is not None:
+                self.opponents.setdefault(player_b, set()).add(player_a)
+
+    def has_played(self, player_a, player_b):
+        return player_b in self.opponents.get(player_a, ())
+
+    def had_bye(self, player_id):
+        return self.has_played(player_id, None)
+
+    def __contains__(self, pair):
+        player_b = pair[1] if len(pair) > 1 else None
+        return self.has_played(pair[0], player_b)
+
+
+def _match_block(block, scores, played, leftover_cost, base_weight,
+                 rematch_penalty):
+    graph = nx.Graph()
+    for i, player_a in enumerate(block):
+        for player_b in block[i + 1:]:
+            cost = (scores[player_a] - scores[player_b]) ** 2
+            if played.has_played(player_a, player_b):
+                cost += rematch_penalty
+            graph.add_edge(player_a, player_b, weight=base_weight - cost)
+    if len(block) % 2:
+        for player in block:
+            graph.add_edge(
+                LEFTOVER, player, weight=base_weight - leftover_cost(player))
+
+    pairs = []
+    leftover = None
+    for player_a, player_b in nx.max_weight_matching(
+            graph, maxcardinality=True):
+        if LEFTOVER in (player_a, player_b):
+            leftover = player_b if player_a == LEFTOVER else player_a
+        elif scores[player_a] >= scores[player_b]:
+            pairs.append([player_a, player_b])
+        else:
+            pairs.append([player_b, player_a])
+    return pairs, leftover
+
+
+def weighted_pairings(scores, past_pairings):
+    """ Pair players by solving a maximum weight matching on a graph where
+    every edge is a possible match.
+    Args:
+        scores - dict; {player_id: score in tournament}
+        past_pairings - OpponentIndex or list of pairs already played,
+            e.g. [[1, 5], [3, None]] where None means the player had a bye
+    Returns list of pairings in the same format as generate_pairings_list,
+    e.g. [[1, 5], [2, 4], [3]] - highest scores first, the bye (if any) last.
+
+    Edge weights prefer players with close scores, heavily penalise rematches
+    and give the bye to the lowest scoring player that didn't have one yet.
+    """
+    if isinstance(past_pairings, OpponentIndex):
+        played = past_pairings
+    else:
+        played = OpponentIndex(past_pairings)
+    player_ids = list(scores)
+    shuffle(player_ids)  # players with equal score meet in random order
+    player_ids.sort(key=lambda player_id: scores[player_id], reverse=True)
+
+    max_score = max(scores.values(), default=0)
+    # A single rematch (or a second bye) costs more than the score distance of
+    # a whole round, so one is only accepted when nothing else is possible.
+    rematch_penalty = (max_score ** 2 + 1) * (len(player_ids) + 1)
+    base_weight = 2 * rematch_penalty + max_score ** 2 + 1
+
+    def bye_cost(player_id):
+        cost = scores[player_id] ** 2
+        if played.had_bye(player_id):
+            cost += rematch_penalty
+        return cost
+
+    pairings = []
+    leftover = None
+    for start in range(0, len(player_ids), BLOCK_SIZE):
+        block = player_ids[start:start + BLOCK_SIZE]
+        if leftover is not None:
+            block.insert(0, leftover)
+        next_start = start + BLOCK_SIZE
+        if next_start < len(player_ids):
+            next_score = scores[player_ids[next_start]]
+
+            def leftover_cost(player_id, next_score=next_score):
+                return (scores[player_id] - next_score) ** 2
+        else:
+            leftover_cost = bye_cost
+
+        pairs, leftover = _match_block(
+            block, scores, played, leftover_cost, base_weight,
+            rematch_penalty)
+        pairings += pairs
+
+    pairings.sort(key=lambda pair: scores[pair[0]], reverse=True)
+    if leftover is not None:
+        pairings.append([leftover])
+    return pairings
@@ -1,21 +1,31 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from random import shuffle
 
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.parsers import JSONParser
 
-from event_organizer.models import Player, Tournament, Match
-from event_organizer.serializers import (TournamentPairingsSerializer)
+from event_organizer.decorators import tournament_condition
+from event_organizer.models import Player, Tournament, Match, PairingJob
+from event_organizer.pairing_engine import OpponentIndex, weighted_pairings
+from event_organizer.serializers import (
+    TournamentPairingsSerializer, PairingJobSerializer)
+
+logger = logging.getLogger(__name__)
 
 
 def check_unique_pairings(current_pairings, past_pairings):
+    if not isinstance(past_pairings, OpponentIndex):
+        past_pairings = OpponentIndex(past_pairings)
     duplicate_index = []
     unique = True
     for i in range(len(current_pairings)):
         pair = current_pairings[i]
-        if len(pair) < 2:
-            pair = [pair[0], None]
-        if pair in past_pairings or pair[::-1] in past_pairings:
+        if pair in past_pairings:  # either order, [id] means a bye
             unique = False
             duplicate_index.append(i)
     return unique, duplicate_index
@@ -69,15 +79,20 @@ def generate_pairings_list(player_ids):
     return pairings
 
 
-def generate_matches(pairings, tournament):
-    round_num = tournament.round_number_next
+def generate_matches(pairings, tournament, round_num=None, players=None):
+    # Creates the whole round with a single INSERT and returns new matches.
+    # players - optional dict {player_id: Player}; matches get the instances,
+    # so serializing them doesn't query for player names
+    if round_num is None:
+        round_num = tournament.round_number_next
 
+    matches = []
     for pair in pairings:
         if len(pair) == 2:
             match = Match(
                 player_1_id=pair[0],
                 player_2_id=pair[1],
-                tournament_id=tournament.id,
+                tournament=tournament,
                 player_1_score=0,
                 player_2_score=0,
                 draws=0,
@@ -87,21 +102,29 @@ def generate_matches(pairings, tournament):
             match = Match(
                 player_1_id=pair[0],
                 player_2_id=None,
-                tournament_id=tournament.id,
+                tournament=tournament,
                 player_1_score=2,
                 player_2_score=0,
                 draws=0,
                 round=round_num
             )
-        match.save()
+        if players is not None:
+            match.player_1 = players[match.player_1_id]
+            if match.player_2_id is not None:
+                match.player_2 = players[match.player_2_id]
+        matches.append(match)
+
+    Match.save_all(matches)
+    tournament.record_pairings(pairings)
+    return matches
 
 
 def get_players_by_score(player_ids, players, tournament):
     results = {}
+    snapshot = tournament.score_snapshot()
     # Creates histogram => result = {"9": [1, 3], "6": [2, 4]}
     for player in players:
-        player_score = player.get_score_in_tournament(
-            tournament_id=tournament.id)
+        player_score = snapshot.points(player.id)
         if player_score not in results:
             results[player_score] = []
         results[player_score].append(player.id)
@@ -132,36 +155,209 @@ def allow_duplicates_in_pairings(unique, duplicates, pairings, past_pairings):
     return pairings
 
 
+def legacy_pairings(players, tournament):
+    player_ids = [player.id for player in players]
+    ids_list = get_players_by_score(player_ids, players, tournament)
+    pairings = generate_pairings_list(ids_list)
+    past_pairings = tournament.opponent_index()
+    unique, duplicates = check_unique_pairings(pairings, past_pairings)
+
+    return allow_duplicates_in_pairings(
+        unique, duplicates, pairings, past_pairings)
+
+
+def max_weight_pairings(players, tournament):
+    snapshot = tournament.score_snapshot()
+    scores = {player.id: snapshot.points(player.id) for player in players}
+    return weighted_pairings(scores, tournament.opponent_index())
+
+
+PAIRING_STRATEGIES = {
+    'legacy': legacy_pairings,
+    'weighted': max_weight_pairings,
+}
+
+
+class PairingInProgress(Exception):
+    """ Another request is generating pairings of the same tournament. """
+
+
+def pair_next_round(tournament, strategy, progress=None):
+    """ Generates matches of the next round of the tournament.
+    Args:
+        tournament - Tournament instance with finished current round
+        strategy - key of PAIRING_STRATEGIES
+        progress - optional callable, called with percent of work done
+    Returns list of created matches or None if no round was created, because
+    all rounds were played or another request created it first.
+    Raises PairingInProgress if another request is pairing the tournament.
+    """
+    report = progress or (lambda percent: None)
+    with transaction.atomic():
+        # The tournament row works as a lock across processes. Other requests
+        # don't wait for it - they read the round created by the lock owner.
+        try:
+            Tournament.objects.select_for_update(nowait=True).get(
+                id=tournament.id)
+        except DatabaseError:
+            raise PairingInProgress()
+        tournament.refresh_from_db()
+        if not tournament.is_current_round_finished:
+            return None
+
+        players = tournament.state().players
+
+        new_matches = None
+        round_num = tournament.round_number_next
+        if tournament.rounds_number >= round_num:
+            report(10)
+            pairings = PAIRING_STRATEGIES[strategy](players, tournament)
+            report(70)
+            new_matches = generate_matches(
+                pairings, tournament, round_num,
+                players={player.id: player for player in players})
+            report(90)
+
+        tournament.update_rounds_number(number=None)
+    return new_matches
+
+
+def claim_pairing_job(job_id=None):
+    # Marks the oldest queued job (or the given one) as running. Jobs locked
+    # by other workers are skipped, so each job is claimed only once.
+    PairingJob.fail_stale()
+    with transaction.atomic():
+        jobs = PairingJob.objects.select_for_update(skip_locked=True).filter(
+            status=PairingJob.QUEUED).order_by('id')
+        if job_id is not None:
+            jobs = jobs.filter(id=job_id)
+        job = jobs.first()
+        if job is not None:
+            job.start()
+    return job
+
+
+def run_pairing_job(job):
+    tournament = Tournament.objects.get(id=job.tournament_id)
+    try:
+        if not tournament.players.exists():
+            job.fail('No players in this tournament yet. Add players first.')
+        elif not tournament.is_current_round_finished:
+            job.fail('current round not finished yet')
+        else:
+            new_matches = pair_next_round(
+                tournament, job.strategy, progress=job.set_progress)
+            serializer = TournamentPairingsSerializer(
+                tournament, context={'current_round': new_matches})
+            job.finish(serializer.data)
+    except PairingInProgress:
+        job.fail('Pairings are being generated by another request')
+    except Exception:
+        # the traceback stays in the log, the job is readable by anyone
+        logger.exception('Pairing job %s failed', job.id)
+        job.fail('Pairings could not be generated')
+
+
+def _run_pairing_job_in_thread(job_id):
+    try:
+        job = claim_pairing_job(job_id)
+        if job is not None:
+            run_pairing_job(job)
+    finally:
+        connection.close()  # threads don't reuse their connections
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit_pairing_job(job_id):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PAIRING_JOB_THREADS)
+    _executor.submit(_run_pairing_job_in_thread, job_id)
+
+
+def enqueue_pairing_job(tournament, strategy):
+    # A tournament has at most one queued or running job, enforced by the
+    # pairing_job_active_uniq index for concurrent requests
+    PairingJob.fail_stale(tournament=tournament)
+    active_jobs = PairingJob.objects.filter(
+        tournament=tournament, status__in=PairingJob.ACTIVE_STATUSES)
+    job = active_jobs.first()
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            job = PairingJob.objects.create(
+                tournament=tournament, strategy=strategy)
+            if settings.PAIRING_JOBS_MODE == 'thread':
+                transaction.on_commit(lambda: submit_pairing_job(job.id))
+    except IntegrityError:
+        # another request created it first
+        job = PairingJob.objects.filter(
+            tournament=tournament).order_by('-id').first()
+    return job
+
+
+def start_next_round(tournament, strategy=None):
+    # Pairs the next round now, or queues a job for it, depending on
+    # PAIRING_JOBS_MODE. Used when the round is started outside of the
+    # pairings endpoint.
+    strategy = strategy or settings.PAIRING_STRATEGY
+    if settings.PAIRING_JOBS_MODE != 'sync':
+        enqueue_pairing_job(tournament, strategy)
+        return
+    try:
+        pair_next_round(tournament, strategy)
+    except PairingInProgress:
+        pass
+
+
 @csrf_exempt
+@tournament_condition
 def tournament_pairings(request, tournament_id):  # Main function in pairings
     try:
         tournament = Tournament.objects.get(id=tournament_id)
     except Tournament.DoesNotExist:
         return HttpResponse(status=404)
 
+    strategy = request.GET.get('strategy', settings.PAIRING_STRATEGY)
+    if strategy not in PAIRING_STRATEGIES:
+        return JsonResponse(
+            {'error': f'Unknown pairing strategy: {strategy}'}, status=400)
+
     if not tournament.is_current_round_finished:
         return HttpResponse("current round not finished yet")
 
-    players_all = tournament.players.all()
-    players = [player for player in players_all]
-    player_ids = [player.id for player in players]
-
-    if player_ids:
-        ids_list = get_players_by_score(player_ids, players, tournament)
-        pairings = generate_pairings_list(ids_list)
-        past_pairings = tournament.past_round_pairings
-        unique, duplicates = check_unique_pairings(pairings, past_pairings)
+    if tournament.players.exists():
+        if settings.PAIRING_JOBS_MODE != 'sync':
+            job = enqueue_pairing_job(tournament, strategy)
+            serializer_return = PairingJobSerializer(job)
+            return JsonResponse(serializer_return.data, status=202)
 
-        pairings = allow_duplicates_in_pairings(
-            unique, duplicates, pairings, past_pairings)
-
-        if tournament.rounds_number >= tournament.round_number_next:
-            generate_matches(pairings, tournament)
-
-        tournament.update_rounds_number(number=None)
-        serializer_return = TournamentPairingsSerializer(tournament)
+        try:
+            new_matches = pair_next_round(tournament, strategy)
+        except PairingInProgress:
+            new_matches = None  # return the current state without waiting
+        serializer_return = TournamentPairingsSerializer(
+            tournament, context={'current_round': new_matches})
         return JsonResponse(serializer_return.data, safe=False)
 
     else:
         return HttpResponse(
         'No players in this tournament yet. Add players first.')
+
+
+@csrf_exempt
+def pairing_job_detail(request, tournament_id, job_id):
+    try:
+        job = PairingJob.objects.get(id=job_id, tournament_id=tournament_id)
+    except PairingJob.DoesNotExist:
+        return HttpResponse(status=404)
+
+    if request.method == 'GET':
+        serializer = PairingJobSerializer(job)
+        return JsonResponse(serializer.data)
@@ -0,0 +1,186 @@
+import numpy as np
+
+MATCH_FIELDS = (
+    'player_1_id', 'player_2_id', 'player_1_score', 'player_2_score', 'draws')
+
+# Match win and game win percentages never go below 33% (MTG tournament rules)
+MIN_PERCENTAGE = 0.33
+
+
+def match_points(own_score, opponent_score, draws):
+    """ Points a player gets for a single match. Same rules as
+    Player.calculate_score_1 and Player.calculate_score_2.
+    """
+    if own_score > opponent_score:
+        return 3
+    # draws are counted even if players recorded them incorrectly
+    if own_score == opponent_score and (draws > 0 or own_score > 0):
+        return 1
+    return 0
+
+
+def result_totals(own_score, opponent_score, draws):
+    """ What a single match adds to player's totals in PlayerStanding.
+    Returns None for matches that are not finished yet.
+    """
+    if not (own_score or opponent_score or draws):
+        return None
+    return {
+        'points': match_points(own_score, opponent_score, draws),
+        'wins': int(own_score > opponent_score),
+        'losses': int(own_score < opponent_score),
+        'draws': int(own_score == opponent_score),
+        'games_won': own_score,
+        'games_lost': opponent_score,
+        'games_drawn': draws,
+    }
+
+
+def match_sides(player_1_id, player_2_id, player_1_score, player_2_score,
+                draws):
+    """ Match from the point of view of each of its players, tuples of
+    (player_id, opponent_id, own_score, opponent_score, draws).
+    """
+    sides = [(player_1_id, player_2_id, player_1_score, player_2_score, draws)]
+    if player_2_id is not None:  # player_1 had a bye
+        sides.append(
+            (player_2_id, player_1_id, player_2_score, player_1_score, draws))
+    return sides
+
+
+class ScoreSnapshot:
+    """ Points of every player in a tournament, built in one pass over the
+    tournament's matches.
+    Args:
+        matches - iterable of tuples in MATCH_FIELDS order
+    """
+
+    def __init__(self, matches=()):
+        self.scores = {}
+        for match in matches:
+            self.add_match(*match)
+
+    @classmethod
+    def for_tournament(cls, tournament):
+        # one query for all matches of the tournament
+        return cls(tournament.matches.order_by().values_list(*MATCH_FIELDS))
+
+    def add_match(self, player_1_id, player_2_id, player_1_score,
+                  player_2_score, draws):
+        self.scores[player_1_id] = self.points(player_1_id) + match_points(
+            player_1_score, player_2_score, draws)
+        if player_2_id is not None:  # player_1 had a bye
+            self.scores[player_2_id] = self.points(player_2_id) + match_points(
+                player_2_score, player_1_score, draws)
+
+    def points(self, player_id):
+        return self.scores.get(player_id, 0)
+
+
+def index_players(player_ids, ids_to_find):
+    """ Position of each of ids_to_find in player_ids, -1 if it's missing. """
+    players_number = len(player_ids)
+    if not players_number:
+        return np.full(len(ids_to_find), -1, dtype=np.int64)
+    ids = np.array(player_ids, dtype=np.int64)
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+    position = np.searchsorted(sorted_ids, ids_to_find).clip(
+        0, players_number - 1)
+    return np.where(sorted_ids[position] == ids_to_find, order[position], -1)
+
+
+def tiebreakers(match_points, rounds, game_points, games_played,
+                player_index, opponent_index):
+    """ Opponents' match win %, game win % and opponents' game win %.
+    Args:
+        match_points, rounds, game_points, games_played - arrays with totals
+            of finished matches, one element per player
+        player_index, opponent_index - arrays; one element for every time
+            a player met an opponent (byes excluded)
+    Returns tuple of three arrays; fractions between 0 and 1.
+    """
+    players_number = len(match_points)
+
+    def percentage(points, possible):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.maximum(points / possible, MIN_PERCENTAGE)
+        return np.where(possible > 0, result, 0.0)
+
+    match_win = percentage(match_points, 3 * rounds)
+    game_win = percentage(game_points, 3 * games_played)
+    opponents = np.bincount(player_index, minlength=players_number)
+
+    def opponents_average(values):
+        total = np.bincount(
+            player_index, weights=values[opponent_index],
+            minlength=players_number)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(opponents > 0, total / opponents, 0.0)
+
+    return (
+        opponents_average(match_win), game_win, opponents_average(game_win))
+
+
+def standings_from_totals(rows):
+    """ Standings from stored PlayerStanding totals.
+    Args:
+        rows - list of dicts with id, first_name, last_name and the totals of
+            PlayerStanding; totals are None for players without a standing
+    """
+    players_number = len(rows)
+    player_ids = [row["id"] for row in rows]
+
+    def column(name):
+        return np.array(
+            [row[name] or 0 for row in rows], dtype=np.int64).reshape(
+                players_number)
+
+    points = column("points")
+    rounds = column("wins") + column("losses") + column("draws")
+    games_won = column("games_won")
+    games_lost = column("games_lost")
+    games_drawn = column("games_drawn")
+
+    player_index = []
+    opponent_ids = []
+    for i, row in enumerate(rows):
+        for opponent_id in (row["opponents"] or "").split(","):
+            if opponent_id:
+                player_index.append(i)
+                opponent_ids.append(int(opponent_id))
+    opponent_index = index_players(
+        player_ids, np.array(opponent_ids, dtype=np.int64))
+    player_index = np.array(player_index, dtype=np.int64)
+    known = opponent_index >= 0
+
+    omw, gw, ogw = tiebreakers(
+        points, rounds, 3 * games_won + games_drawn,
+        games_won + games_lost + games_drawn,
+        player_index[known], opponent_index[known])
+    return rank_standings(rows, points, omw, gw, ogw)
+
+
+def rank_standings(players, points, omw, gw, ogw):
+    """ Orders players by points, then by the tiebreakers.
+    Args:
+        players - list of dicts with id, first_name and last_name
+        points, omw, gw, ogw - arrays in the players order
+    """
+    # np.lexsort sorts by the last key first
+    ranking = np.lexsort((-ogw, -gw, -omw, -points))
+
+    standings = []
+    for order, i in enumerate(ranking, start=1):
+        player = players[i]
+        standings.append({
+            "id": player["id"],
+            "first_name": player["first_name"],
+            "last_name": player["last_name"],
+            "score": int(points[i]),
+            "omw_percentage": round(float(omw[i]) * 100, 2),
+            "gw_percentage": round(float(gw[i]) * 100, 2),
+            "ogw_percentage": round(float(ogw[i]) * 100, 2),
+            "order": order,
+        })
+    return standings
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from event_organizer.models import Player, Tournament, Match
@@ -121,6 +122,9 @@ class StandingsSerializer(serializers.Serializer):
     first_name = serializers.CharField(read_only=True)
     last_name = serializers.CharField(read_only=True)
     score = serializers.IntegerField(read_only=True)
+    omw_percentage = serializers.FloatField(read_only=True)
+    gw_percentage = serializers.FloatField(read_only=True)
+    ogw_percentage = serializers.FloatField(read_only=True)
 
 
 class TournamentDetailSerializer(serializers.Serializer):
@@ -130,7 +134,7 @@ class TournamentDetailSerializer(serializers.Serializer):
     date_beginning = serializers.DateTimeField()
     date_ending = serializers.DateTimeField(required=False)
     rounds_number = serializers.IntegerField(read_only=True)
-    players = GetPlayerSerializer(many=True)
+    players = GetPlayerSerializer(many=True, source='state.players')
     current_round = MatchDetailSerializer(many=True, read_only=True)
     past_rounds = MatchDetailSerializer(many=True, read_only=True)
     is_finished = serializers.BooleanField(read_only=True)
@@ -138,6 +142,12 @@ class TournamentDetailSerializer(serializers.Serializer):
     standings = StandingsSerializer(many=True, read_only=True)
 
 
+class TournamentStandingsSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    version = serializers.IntegerField(read_only=True)
+    standings = StandingsSerializer(many=True, read_only=True)
+
+
 class AddPlayersToTournamentSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     name = serializers.CharField(read_only=True)
@@ -151,12 +161,33 @@ class TournamentPairingsSerializer(serializers.Serializer):
     name = serializers.CharField(read_only=True)
     date_beginning = serializers.DateTimeField(read_only=True)
     date_ending = serializers.DateTimeField(read_only=True, required=False)
-    players = GetPlayerSerializer(read_only=True, many=True)
-    current_round = MatchDetailSerializer(many=True, read_only=True)
+    players = GetPlayerSerializer(
+        read_only=True, many=True, source='state.players')
+    current_round = serializers.SerializerMethodField()
     is_current_round_finished = serializers.BooleanField(read_only=True)
     rounds_number = serializers.IntegerField(read_only=True)
     standings = StandingsSerializer(many=True, read_only=True)
 
+    def get_current_round(self, tournament):
+        # Matches just created by the pairings don't have to be queried again
+        matches = self.context.get('current_round')
+        if matches is None:
+            matches = tournament.current_round
+        return MatchDetailSerializer(matches, many=True).data
+
+
+class PairingJobSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    tournament_id = serializers.IntegerField(read_only=True)
+    strategy = serializers.CharField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    progress = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    started_at = serializers.DateTimeField(read_only=True)
+    finished_at = serializers.DateTimeField(read_only=True)
+    error = serializers.CharField(read_only=True)
+    result = serializers.JSONField(source='result_data', read_only=True)
+
 
 class PlayersCurrentTournaments(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
@@ -182,8 +213,9 @@ class PlayersTournamentHistory(serializers.Serializer):
     class Meta:
         model = Player
 
-    def score(self, Tournament):
-        return Tournament.score_by_player_id(self.id)
+    def get_score(self, tournament):
+        # context['scores'] - Player.tournament_scores() of the player
+        return self.context['scores'].get(tournament.id, 0)
 
 
 class LoginSerializer(serializers.Serializer):
@@ -225,6 +257,20 @@ class RegisterRequestSerializer(serializers.Serializer):
         return data
 
 
+class BulkRegisterRequestSerializer(serializers.Serializer):
+    # Addresses are checked one by one in the view, so a bad one doesn't
+    # reject the whole list
+    emails = serializers.ListField(
+        child=serializers.CharField(allow_blank=True),
+        allow_empty=False)
+
+    def validate_emails(self, emails):
+        if len(emails) > settings.MAX_INVITATIONS:
+            raise serializers.ValidationError(
+                f'At most {settings.MAX_INVITATIONS} emails at a time')
+        return emails
+
+
 class RegisterTokenSerializer(serializers.Serializer):
     email = serializers.EmailField(
             required=True, allow_blank=False)
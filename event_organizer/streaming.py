@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+def is_streamed(request):
+    return request.GET.get('stream') in ('1', 'true')
+
+
+def _chunks(queryset, chunk_size):
+    # keyset chunks: each one is a separate query of at most chunk_size rows
+    after = 0
+    while True:
+        rows = list(queryset.order_by('id').filter(id__gt=after)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        after = rows[-1].id
+
+
+def _json_array(queryset, serializer_class, context, chunk_size):
+    encoder = DjangoJSONEncoder()
+    yield '['
+    separator = ''
+    for rows in _chunks(queryset, chunk_size):
+        for item in serializer_class(rows, many=True, context=context).data:
+            yield separator + encoder.encode(item)
+            separator = ','
+    yield ']'
+
+
+def _ndjson(queryset, serializer_class, context, chunk_size):
+    encoder = DjangoJSONEncoder()
+    for rows in _chunks(queryset, chunk_size):
+        data = serializer_class(rows, many=True, context=context).data
+        yield ''.join(encoder.encode(item) + '\n' for item in data)
+
+
+def stream_response(request, queryset, serializer_class, context=None):
+    """ Whole queryset serialized piece by piece, ordered by id. Only
+    STREAM_CHUNK_SIZE rows are in memory at once.
+    ?format=ndjson streams one JSON object per line instead of a JSON array.
+    """
+    chunk_size = settings.STREAM_CHUNK_SIZE
+    if request.GET.get('format') == 'ndjson':
+        return StreamingHttpResponse(
+            _ndjson(queryset, serializer_class, context, chunk_size),
+            content_type='application/x-ndjson')
+    return StreamingHttpResponse(
+        _json_array(queryset, serializer_class, context, chunk_size),
+        content_type='application/json')
@@ -0,0 +1,157 @@
+import secrets
+import threading
+from collections import OrderedDict
+from time import monotonic, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+class TokenCache:
+    """ Tokens already checked by is_authorized, so repeated requests with
+    the same token don't query the database.
+    Bounded LRU; entries expire after ttl seconds, so a token revoked by
+    another process is rejected here at the latest after ttl.
+    Args:
+        size - maximum number of tokens, default AUTH_TOKEN_CACHE_SIZE
+        ttl - seconds, default AUTH_TOKEN_CACHE_TTL
+    """
+
+    def __init__(self, size=None, ttl=None):
+        self._size = size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size or settings.AUTH_TOKEN_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl or settings.AUTH_TOKEN_CACHE_TTL
+
+    def get(self, uuid):
+        # Returns (player_id, is_revoked) or None if the token isn't cached
+        with self._lock:
+            entry = self._entries.get(uuid)
+            if entry is None:
+                return None
+            player_id, is_revoked, valid_until = entry
+            if valid_until < monotonic():
+                del self._entries[uuid]
+                return None
+            self._entries.move_to_end(uuid)
+            return player_id, is_revoked
+
+    def set(self, uuid, player_id, is_revoked=False):
+        with self._lock:
+            self._entries[uuid] = (
+                player_id, is_revoked, monotonic() + self.ttl)
+            self._entries.move_to_end(uuid)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def revoke(self, uuid, player_id=None):
+        self.set(uuid, player_id, is_revoked=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+# Signed tokens: "v1.<key id>.<player id>.<issued at>.<jti>.<signature>",
+# verified without the database. The random jti tells apart tokens of the same
+# player issued in the same second, so logout revokes only its own session.
+# Token rows are only used in AUTH_TOKEN_MODE 'table' and, during migration,
+# accepted in 'signed' mode.
+SIGNED_TOKEN_PREFIX = 'v1'
+SIGNING_SALT = 'event_organizer.tokens'
+
+# Revocations must be seen by every process, so they can't be kept in a
+# per-process cache
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_revocation_cache():
+    # Called when the app is loaded
+    if settings.AUTH_TOKEN_MODE == 'table':
+        return
+    alias = settings.AUTH_TOKEN_REVOCATION_CACHE
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None or backend in LOCAL_CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            f'AUTH_TOKEN_MODE {settings.AUTH_TOKEN_MODE!r} needs a cache '
+            f'shared by all processes in CACHES[{alias!r}] to revoke tokens '
+            f'on logout, not {backend}')
+
+
+def _revocations():
+    return caches[settings.AUTH_TOKEN_REVOCATION_CACHE]
+
+
+def _signature(key_id, payload):
+    secret = settings.AUTH_TOKEN_KEYS[key_id]
+    return salted_hmac(SIGNING_SALT, payload, secret=secret).hexdigest()
+
+
+def is_signed_token(token):
+    return token.startswith(SIGNED_TOKEN_PREFIX + '.')
+
+
+def sign_token(player_id, issued_at=None):
+    key_id = settings.AUTH_TOKEN_KEY_ID
+    if issued_at is None:
+        issued_at = int(time())
+    jti = secrets.token_hex(8)
+    payload = f'{SIGNED_TOKEN_PREFIX}.{key_id}.{player_id}.{issued_at}.{jti}'
+    return f'{payload}.{_signature(key_id, payload)}'
+
+
+def _parse(token):
+    # (payload, signature, key id, player id, issued at, jti), ValueError if
+    # the token is malformed
+    payload, signature = token.rsplit('.', 1)
+    prefix, key_id, player_id, issued_at, jti = payload.split('.')
+    if prefix != SIGNED_TOKEN_PREFIX:
+        raise ValueError(prefix)
+    return payload, signature, key_id, int(player_id), int(issued_at), jti
+
+
+def verify_signed_token(token):
+    """ Returns player id of a valid signed token, None if the token is
+    malformed, signed with an unknown key, expired or revoked.
+    """
+    try:
+        payload, signature, key_id, player_id, issued_at, jti = _parse(token)
+    except ValueError:
+        return None
+    if key_id not in settings.AUTH_TOKEN_KEYS:
+        return None
+    if not constant_time_compare(signature, _signature(key_id, payload)):
+        return None
+    if issued_at + settings.AUTH_TOKEN_MAX_AGE < time():
+        return None
+    if _revocations().get(_revoked_key(jti)):
+        return None
+    return player_id
+
+
+def _revoked_key(jti):
+    return f'revoked-token:{jti}'
+
+
+def revoke_signed_token(token):
+    # Kept on the revocation list until the token would expire anyway
+    payload, signature, key_id, player_id, issued_at, jti = _parse(token)
+    remaining = issued_at + settings.AUTH_TOKEN_MAX_AGE - time()
+    if remaining > 0:
+        _revocations().set(_revoked_key(jti), True, int(remaining) + 1)
@@ -0,0 +1,34 @@
+""" Serialized tournament responses kept in Django's cache framework.
+
+Payloads are stored under the tournament's version (see Tournament.version),
+read from the database on every request. Every change of what is served
+bumps the version, so a cached payload is never served for a newer version,
+whichever process wrote it and whatever cache backend is used.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+PAYLOADS = ('detail', 'standings')
+
+
+def payload_key(tournament_id, version, name):
+    return f'tournament:{tournament_id}:{version}:{name}'
+
+
+def get_payload(tournament_id, version, name, build):
+    # build - callable returning the payload, None if there is nothing to
+    # cache (e.g. the tournament was just deleted)
+    key = payload_key(tournament_id, version, name)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        if payload is not None:
+            # first payload built for the version wins
+            cache.add(key, payload, settings.TOURNAMENT_CACHE_TTL)
+    return payload
+
+
+def delete_payloads(tournament_id, version):
+    # For deleted tournaments, whose id may be reused by the database
+    cache.delete_many(
+        [payload_key(tournament_id, version, name) for name in PAYLOADS])
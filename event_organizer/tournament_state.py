@@ -0,0 +1,42 @@
+class TournamentState:
+    """ Matches and players of a tournament, loaded once and shared by all
+    round properties of the tournament (see Tournament.state).
+    Args:
+        tournament - Tournament instance
+    """
+
+    def __init__(self, tournament):
+        self.tournament = tournament
+        self._matches = None
+        self._players = None
+
+    @property
+    def matches(self):
+        if self._matches is None:
+            matches = self.tournament.matches.all()
+            prefetched = getattr(
+                self.tournament, '_prefetched_objects_cache', {})
+            if 'matches' not in prefetched:
+                # match serializers read names of both players
+                matches = matches.select_related('player_1', 'player_2')
+            self._matches = list(matches)
+        return self._matches
+
+    @property
+    def players(self):
+        if self._players is None:
+            self._players = list(self.tournament.players.all())
+        return self._players
+
+    @property
+    def current_round(self):
+        # No pairings were generated yet
+        if not self.tournament.last_round:
+            return []
+        round_num = self.tournament.round_number_next
+        return [match for match in self.matches if match.round == round_num]
+
+    @property
+    def past_rounds(self):
+        round_num = self.tournament.round_number_next
+        return [match for match in self.matches if match.round != round_num]
@@ -3,8 +3,10 @@ from event_organizer.views import (
     player_list, player_details, tournament_list, tournament_detail,
     match_detail, match_list, add_players_to_tournament, register_view,
     players_current_tournaments, player_history, login, register_request_view,
-    password_reset_request, reset_password_view, logout)
-from event_organizer.pairing_view import tournament_pairings
+    password_reset_request, reset_password_view, logout, tournament_standings,
+    send_invitation)
+from event_organizer.pairing_view import (
+    tournament_pairings, pairing_job_detail)
 
 urlpatterns = [
     path('players/', player_list),
@@ -16,8 +18,14 @@ urlpatterns = [
         'tournaments/<int:tournament_id>/matches/<int:match_id>/',
         match_detail
     ),
+    path(
+        'tournaments/<int:tournament_id>/standings/', tournament_standings),
     path('tournaments/<int:id>/add_players/', add_players_to_tournament),
     path('tournaments/<int:tournament_id>/pairings/', tournament_pairings),
+    path(
+        'tournaments/<int:tournament_id>/pairings/jobs/<int:job_id>/',
+        pairing_job_detail
+    ),
     path('players/<int:id>/current_tournaments/', players_current_tournaments),
     path('players/<int:id>/player_history/', player_history),
     path('login/', login),
@@ -27,5 +35,5 @@ urlpatterns = [
     path('password_reset/<uuid:token_uuid>/', reset_password_view),
     path('players_settings/', player_details),
     path('logout/', logout),
-    path('send_invitation/', register_request_view),
+    path('send_invitation/', send_invitation),
 ]
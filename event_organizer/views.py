@@ -1,5 +1,9 @@
 from random import random
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.parsers import JSONParser
@@ -16,23 +20,35 @@ from event_organizer.serializers import (
     PlayersCurrentTournaments, PlayersTournamentHistory, TokenSerializer,
     LoginSerializer, RegisterTokenSerializer, RegisterRequestSerializer,
     PasswordResetRequestSerializer, PasswordResetTokenSerializer,
-    PasswordPlayerSerializer, MatchSubmitScoreSerializer, TounamentPlayersDrop
+    PasswordPlayerSerializer, MatchSubmitScoreSerializer, TounamentPlayersDrop,
+    TournamentStandingsSerializer, BulkRegisterRequestSerializer
 )
-from event_organizer.decorators import is_authorized
+from event_organizer.decorators import (
+    hashing_backpressure, is_authorized, tournament_condition)
+from event_organizer.pagination import is_paginated, keyset_page
+from event_organizer.streaming import is_streamed, stream_response
+from event_organizer.tokens import (
+    is_signed_token, revoke_signed_token, sign_token, token_cache)
+from event_organizer.tournament_cache import get_payload
 from player_services.services import (
     send_password_reset_mail, check_token_validity, send_user_register_mail,
-    MinimumLengthValidator, NumericPasswordValidator)
+    send_user_register_mails, MinimumLengthValidator, NumericPasswordValidator)
 
-from event_organizer.pairing_view import tournament_pairings
+from event_organizer.pairing_view import tournament_pairings, start_next_round
 
 
 @csrf_exempt
+@hashing_backpressure
 def player_list(request):
     """
     List all players.
     """
     if request.method == 'GET':
         players = Player.objects.all()
+        if is_streamed(request):
+            return stream_response(request, players, GetPlayerSerializer)
+        if is_paginated(request):
+            return keyset_page(request, players, GetPlayerSerializer)
         serializer = GetPlayerSerializer(players, many=True)
         return JsonResponse(serializer.data, safe=False)
 
@@ -62,9 +78,9 @@ def players_current_tournaments(request, id):
         return HttpResponse(status=404)
 
     if request.method == 'GET':
-        if len(player.get_current_tournaments()) > 0:
-            serializer = PlayersCurrentTournaments(
-                player.get_current_tournaments(), many=True)
+        tournaments = player.get_current_tournaments()
+        if len(tournaments) > 0:
+            serializer = PlayersCurrentTournaments(tournaments, many=True)
             return JsonResponse(serializer.data, safe=False)
         else:
             serializer = {'error': 'Player doesnt participate in any ongoing tournaments'}
@@ -81,20 +97,12 @@ def player_history(request, id):
 
     if request.method == 'GET':
         tournaments = player.get_player_history()
-        serializer = PlayersTournamentHistory(tournaments, many=True)
-
-        # # This should be doable with a SerializerMethodField?
-        # print('sd', serializer.data)
-        # data = serializer.data
-        # zipped = zip(tournaments, data)
-        # # a = [1, 2]
-        # # b = ['a', 'b', 'c']
-        # # zipped = zip(a, b)  # [[1, 'a'], [2, 'b']]
-        # for tournament, tournament_dict in zipped:
-        #     tournament_dict['score'] = tournament.score_by_player_id(id)
-        #     print('tour', tournaments)
-        #
-        #     print('tour_dict', tournament_dict)
+        context = {'scores': player.tournament_scores()}
+        if is_streamed(request):
+            return stream_response(
+                request, tournaments, PlayersTournamentHistory, context)
+        serializer = PlayersTournamentHistory(
+            tournaments, many=True, context=context)
         return JsonResponse(serializer.data, safe=False)
 
 
@@ -122,12 +130,19 @@ def player_details(request, id):
         player.last_name = data['last_name']
         player.email_name = data['email']
         player.save()
+        player.tournaments.bump_version()
 
         serializer_return = GetPlayerSerializer(player)
         return JsonResponse(serializer_return.data, safe=False)
 
     elif request.method == 'DELETE':
-        player.delete()
+        # bumped after the delete, in one transaction, so a payload cached
+        # under the new version can't include the player
+        with transaction.atomic():
+            tournaments = Tournament.objects.filter(id__in=list(
+                player.tournaments.values_list('id', flat=True)))
+            player.delete()
+            tournaments.bump_version()
         return HttpResponse(status=204)
 
 
@@ -161,6 +176,16 @@ def drop_from_tournament(request, tournament_id, player_id):
 def tournament_list(request):
     if request.method == 'GET':
         tournaments = Tournament.objects.all()
+        status = request.GET.get('status')
+        if status is not None:
+            if status not in Tournament.STATUSES:
+                return JsonResponse(
+                    {'error': f'Unknown tournament status: {status}'},
+                    status=400)
+            tournaments = tournaments.with_status(status)
+        if is_paginated(request):
+            return keyset_page(
+                request, tournaments, TournamentListSerializer)
         serializer = TournamentListSerializer(tournaments, many=True)
         return JsonResponse(serializer.data, safe=False)
 
@@ -202,6 +227,8 @@ def add_players_to_tournament(request, id):
                 tournament.players.add(player)
             except Player.DoesNotExist:
                 missing_ids.append(player_id)
+        Tournament.objects.filter(id=tournament.id).bump_version()
+        tournament.invalidate_state()
 
         serializer = AddPlayersToTournamentSerializer(tournament)
         return_data = {
@@ -211,16 +238,42 @@ def add_players_to_tournament(request, id):
         return JsonResponse(return_data, safe=False)
 
 
+def cached_tournament_data(request, tournament_id, name, serializer_class):
+    # Serialized once per version of the tournament; None if it's missing.
+    # The version was already read for the ETag by tournament_condition.
+    version = getattr(request, 'tournament_version', None)
+    if version is None:
+        version = Tournament.current_version(tournament_id)
+    if version is None:
+        return None
+
+    def build():
+        tournament = Tournament.objects.filter(id=tournament_id).first()
+        if tournament is None:
+            return None
+        return serializer_class(tournament).data
+
+    return get_payload(tournament_id, version, name, build)
+
+
 @csrf_exempt
+@tournament_condition
 def tournament_detail(request, id):
+    if request.method == 'GET' and not settings.PAIRINGS_ON_DETAIL_READ:
+        data = cached_tournament_data(
+            request, id, 'detail', TournamentDetailSerializer)
+        if data is None:
+            return HttpResponse(status=404)
+        return JsonResponse(data, safe=False)
+
     try:
         tournament = Tournament.objects.get(id=id)
     except Tournament.DoesNotExist:
         return HttpResponse(status=404)
 
     if request.method == 'GET':
-        tournament = Tournament.objects.get(id=id)
-        if tournament.is_current_round_finished:
+        if (settings.PAIRINGS_ON_DETAIL_READ and
+                tournament.is_current_round_finished):
             tournament_pairings(request, tournament.id)
 
         serializer = TournamentDetailSerializer(tournament, many=False)
@@ -243,15 +296,27 @@ def tournament_detail(request, id):
         return HttpResponse(status=204)
 
 
+@csrf_exempt
+@tournament_condition
+def tournament_standings(request, tournament_id):
+    if request.method == 'GET':
+        data = cached_tournament_data(
+            request, tournament_id, 'standings', TournamentStandingsSerializer)
+        if data is None:
+            return HttpResponse(status=404)
+        return JsonResponse(data, safe=False)
+
+
 @csrf_exempt
 def match_detail(request, tournament_id, match_id):
     try:
-        match = Match.objects.get(id=match_id, tournament_id=tournament_id)
+        match = Match.objects.select_related(
+            'player_1', 'player_2', 'tournament'
+        ).get(id=match_id, tournament_id=tournament_id)
     except Match.DoesNotExist:
         return HttpResponse(status=404)
 
     if request.method == 'GET':
-        match = Match.objects.get(id=match_id)
         serializer = MatchDetailSerializer(match, many=False)
         return JsonResponse(serializer.data, safe=False)
 
@@ -264,6 +329,12 @@ def match_detail(request, tournament_id, match_id):
         match.player_2_score = data['player_2_score']
         match.draws = data['draws']
         match.save()
+
+        tournament = match.tournament
+        if (settings.PAIRINGS_ON_ROUND_FINISHED and
+                tournament.is_current_round_finished):
+            start_next_round(tournament)
+
         serializer_return = MatchDetailSerializer(match)
         return JsonResponse(serializer_return.data, safe=False)
 
@@ -273,6 +344,7 @@ def match_detail(request, tournament_id, match_id):
 
 
 @csrf_exempt
+@tournament_condition
 def match_list(request, tournament_id):
     try:
         tournament = Tournament.objects.get(id=tournament_id)
@@ -280,7 +352,11 @@ def match_list(request, tournament_id):
         return HttpResponse(status=404)
 
     if request.method == 'GET':
-        matches = Match.objects.filter(tournament_id=tournament_id).all()
+        matches = tournament.matches.all()
+        if is_streamed(request):
+            return stream_response(request, matches, MatchListSerializer)
+        if is_paginated(request):
+            return keyset_page(request, matches, MatchListSerializer)
         serializer = MatchListSerializer(matches, many=True)
         return JsonResponse(serializer.data, safe=False)
     elif request.method == 'POST':
@@ -304,6 +380,7 @@ def match_list(request, tournament_id):
 
 
 @csrf_exempt
+@hashing_backpressure
 def login(request):
     """
     Login a player.
@@ -315,8 +392,12 @@ def login(request):
             return JsonResponse(serializer.errors, status=400)
 
         player = Player.objects.get(email=data['email'])
-        token = Token(player_id=player.id)
-        token.save()
+        if settings.AUTH_TOKEN_MODE == 'table':
+            token = Token(player_id=player.id)
+            token.save()
+        else:
+            # not saved; the response has the same fields as for a Token row
+            token = Token(player_id=player.id, uuid=sign_token(player.id))
         serializer_return = TokenSerializer(token)
         return JsonResponse(serializer_return.data, safe=False, status=201)
 
@@ -331,9 +412,13 @@ def logout(request):
         result = request.META['HTTP_AUTHORIZATION']
         player_id = result.split(':')[0]
         uuid = result.split(':')[1]
+        if is_signed_token(uuid):
+            revoke_signed_token(uuid)
+            return HttpResponse(status=204)
         token = Token.objects.get(uuid=uuid)
         token.is_expired = True
         token.save()
+        token_cache.revoke(uuid, token.player_id)
         return HttpResponse(status=204)
 
 
@@ -344,18 +429,85 @@ def register_request_view(request):
     """
     if request.method == 'POST':
         data = JSONParser().parse(request)
-        serializer = RegisterRequestSerializer(data=data)
+        return create_register_request(data)
+
+
+def create_register_request(data):
+    serializer = RegisterRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    token = CreateAccountToken(email=data['email'])
+    token.save()
+    send_user_register_mail(data['email'], token.uuid)
+    serializer_return = RegisterTokenSerializer(token)
+    return JsonResponse(serializer_return.data, safe=False, status=201)
+
+
+def email_statuses(emails):
+    # Status of each distinct address: invalid, exists (already a player) or
+    # invited; players are found with one query
+    statuses = {}
+    for email in emails:
+        try:
+            validate_email(email)
+        except ValidationError:
+            statuses[email] = 'invalid'
+        else:
+            statuses[email] = 'invited' if len(email) <= 254 else 'invalid'
+
+    existing = Player.objects.filter(
+        email__in=[
+            email for email, email_status in statuses.items()
+            if email_status == 'invited']
+    ).values_list('email', flat=True)
+    for email in existing:
+        statuses[email] = 'exists'
+    return statuses
+
+
+@csrf_exempt
+def send_invitation(request):
+    """
+    Invite a list of emails {"emails": [...]} to register, or one email
+    {"email": ...} like register_request/.
+    """
+    if request.method == 'POST':
+        data = JSONParser().parse(request)
+        if not isinstance(data, dict):
+            return JsonResponse(
+                {'non_field_errors': ['Expected a JSON object']}, status=400)
+        if 'emails' not in data:
+            return create_register_request(data)
+
+        serializer = BulkRegisterRequestSerializer(data=data)
         if not serializer.is_valid():
             return JsonResponse(serializer.errors, status=400)
 
-        token = CreateAccountToken(email=data['email'])
-        token.save()
-        send_user_register_mail(data['email'], token.uuid)
-        serializer_return = RegisterTokenSerializer(token)
-        return JsonResponse(serializer_return.data, safe=False, status=201)
+        emails = serializer.validated_data['emails']
+        statuses = email_statuses(emails)
+        tokens = [
+            CreateAccountToken(email=email)
+            for email, email_status in statuses.items()
+            if email_status == 'invited'
+        ]
+        with transaction.atomic():
+            CreateAccountToken.objects.bulk_create(tokens)
+            send_user_register_mails(tokens)
+
+        # repeated addresses are invited once
+        seen = set()
+        results = []
+        for email in emails:
+            email_status = 'duplicate' if email in seen else statuses[email]
+            seen.add(email)
+            results.append({"email": email, "status": email_status})
+        return JsonResponse(
+            {"results": results}, status=201 if tokens else 200)
 
 
 @csrf_exempt
+@hashing_backpressure
 def register_view(request, token_uuid):
     """
     Register a player.
@@ -401,6 +553,7 @@ def password_reset_request(request):
 
 
 @csrf_exempt
+@hashing_backpressure
 def reset_password_view(request, token_uuid):
     """
     Reset players password.
@@ -0,0 +1,134 @@
+import smtplib
+from datetime import timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from event_organizer.models import OutboxMail
+
+
+def smtp_connection():
+    server = smtplib.SMTP(
+        settings.MAIL_SMTP_HOST, settings.MAIL_SMTP_PORT,
+        timeout=settings.MAIL_SMTP_TIMEOUT)
+    server.ehlo()
+    if settings.MAIL_SMTP_STARTTLS:
+        server.starttls()
+        server.ehlo()
+    if settings.MAIL_SMTP_USER:
+        server.login(settings.MAIL_SMTP_USER, settings.MAIL_SMTP_PASSWORD)
+    return server
+
+
+def build_message(mail):
+    msg = MIMEMultipart()
+    msg['From'] = settings.MAIL_FROM
+    msg['To'] = mail.to_email
+    msg['Subject'] = mail.subject
+    msg.attach(MIMEText(mail.body, 'plain'))
+    return msg.as_string()
+
+
+class OutboxSender:
+    """ Delivers due OutboxMail in batches over one SMTP connection, kept
+    open between messages and batches until close().
+    Failed mails are retried after MAIL_RETRY_DELAY seconds, doubled on each
+    attempt, and marked failed after MAIL_MAX_ATTEMPTS; errors other than
+    SMTP and connection ones fail the mail at once.
+    Args:
+        connect - callable returning a logged in smtplib.SMTP-like object
+        batch_size - default MAIL_BATCH_SIZE
+    """
+
+    def __init__(self, connect=smtp_connection, batch_size=None):
+        self.connect = connect
+        self.batch_size = batch_size or settings.MAIL_BATCH_SIZE
+        self._connection = None
+
+    def claim_batch(self):
+        # Claimed mails are postponed by MAIL_RETRY_DELAY, so other senders
+        # skip them and a sender that dies only delays them
+        now = timezone.now()
+        with transaction.atomic():
+            mails = list(
+                OutboxMail.objects.select_for_update(skip_locked=True).filter(
+                    status=OutboxMail.QUEUED, send_after__lte=now
+                ).order_by('send_after', 'id')[:self.batch_size])
+            OutboxMail.objects.filter(
+                id__in=[mail.id for mail in mails]
+            ).update(send_after=now + timedelta(
+                seconds=settings.MAIL_RETRY_DELAY))
+        return mails
+
+    def send_batch(self):
+        # Returns numbers of sent and failed mails
+        sent, failed = 0, 0
+        for mail in self.claim_batch():
+            try:
+                self.send(mail)
+            except (smtplib.SMTPException, OSError) as error:
+                self.mark_failed(mail, error)
+                failed += 1
+            except Exception as error:
+                # e.g. UnicodeEncodeError for an address smtplib can't send,
+                # retrying won't help
+                self.mark_failed(mail, error, permanent=True)
+                failed += 1
+            else:
+                # marked at once, so a later error doesn't send it again
+                self.mark_sent(mail)
+                sent += 1
+        return sent, failed
+
+    def send(self, mail):
+        message = build_message(mail)
+        reused = self._connection is not None
+        try:
+            self._sendmail(mail, message)
+        except smtplib.SMTPServerDisconnected:
+            if not reused:
+                raise
+            # the server dropped the connection while it was idle
+            self._sendmail(mail, message)
+
+    def _sendmail(self, mail, message):
+        if self._connection is None:
+            self._connection = self.connect()
+        try:
+            self._connection.sendmail(
+                settings.MAIL_FROM, [mail.to_email], message)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # the server refused this mail, the connection is still usable
+            raise
+        except Exception:
+            # the connection may be left in the middle of a command
+            self.close()
+            raise
+
+    def mark_sent(self, mail):
+        OutboxMail.objects.filter(id=mail.id).update(
+            status=OutboxMail.SENT, sent_at=timezone.now(),
+            attempts=F('attempts') + 1, error='')
+
+    def mark_failed(self, mail, error, permanent=False):
+        mail.attempts += 1
+        mail.error = repr(error)
+        if permanent or mail.attempts >= settings.MAIL_MAX_ATTEMPTS:
+            mail.status = OutboxMail.FAILED
+        else:
+            delay = settings.MAIL_RETRY_DELAY * 2 ** (mail.attempts - 1)
+            mail.send_after = timezone.now() + timedelta(seconds=delay)
+        mail.save(update_fields=['attempts', 'error', 'status', 'send_after'])
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
@@ -1,8 +1,7 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from django.core.exceptions import ValidationError
 
+from event_organizer.models import OutboxMail
+
 
 class MinimumLengthValidator:
     min_length = 8
@@ -25,27 +24,18 @@ class NumericPasswordValidator:
         return any(i.isdigit() for i in password)
 
 
+def queue_mail(user_email, subject, mail_contents):
+    # Saved to the outbox; `manage.py send_outbox_mail` delivers it
+    return OutboxMail.objects.create(
+        to_email=user_email, subject=subject, body=mail_contents)
+
+
 def send_password_reset_mail(user_email, token):
-    server_email = 'sending.from.python@gmail.com'
-    server_email_password = 'gmail9393'
     subject = 'Password Reset'
-
-    msg = MIMEMultipart()
-    msg['From'] = server_email
-    msg['To'] = user_email
-    msg['Subject'] = subject
     # TODO: Make this text better
     mail_contents = \
         f'Reset token is file:///Users/marsza/workspace/mtg_frontend/html:js/reset_password.html?token={token}'
-    msg.attach(MIMEText(mail_contents,'plain'))
-    text = msg.as_string()
-
-    server = smtplib.SMTP('smtp.gmail.com', 587)
-    server.ehlo()
-    server.starttls()
-    server.login(server_email, server_email_password)
-    server.sendmail(server_email,user_email, text)
-    server.quit()
+    return queue_mail(user_email, subject, mail_contents)
 
 
 def check_token_validity(cls, token_uuid):
@@ -65,24 +55,22 @@ def check_token_validity(cls, token_uuid):
         return None
 
 
-def send_user_register_mail(user_email, token):
-    server_email = 'sending.from.python@gmail.com'
-    server_email_password = 'gmail9393'
+def register_mail(user_email, token):
     subject = 'Join the mtg tournaments!'
-
-    msg = MIMEMultipart()
-    msg['From'] = server_email
-    msg['To'] = user_email
-    msg['Subject'] = subject
     # TODO: Make this text better
     mail_contents = \
         f'To register go to the link - file:///Users/marsza/workspace/mtg_frontend/html:js/register.html?token={token}'
-    msg.attach(MIMEText(mail_contents,'plain'))
-    text = msg.as_string()
-
-    server = smtplib.SMTP('smtp.gmail.com', 587)
-    server.ehlo()
-    server.starttls()
-    server.login(server_email, server_email_password)
-    server.sendmail(server_email,user_email, text)
-    server.quit()
+    return OutboxMail(to_email=user_email, subject=subject, body=mail_contents)
+
+
+def send_user_register_mail(user_email, token):
+    mail = register_mail(user_email, token)
+    mail.save()
+    return mail
+
+
+def send_user_register_mails(tokens):
+    # One insert for all CreateAccountTokens; the outbox sender delivers
+    # them over a single SMTP connection
+    return OutboxMail.objects.bulk_create(
+        register_mail(token.email, token.uuid) for token in tokens)
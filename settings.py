@@ -114,10 +114,111 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Pairings
+# Algorithm used by tournament_pairings unless the request asks for another one
+# with ?strategy=: 'weighted' (maximum weight matching) or 'legacy'.
+
+PAIRING_STRATEGY = 'weighted'
+
+# 'sync' generates pairings inside the request, 'thread' queues a job that runs
+# on a thread pool of the web process and 'worker' queues a job for
+# `manage.py run_pairing_jobs`.
+PAIRING_JOBS_MODE = 'sync'
+PAIRING_JOB_THREADS = 2
+# Running jobs without progress and queued jobs not started for this many
+# seconds are failed, so a dead thread or worker doesn't block pairings of the
+# tournament.
+PAIRING_JOB_TIMEOUT = 300
+
+# GET tournaments/<id>/ only reads unless PAIRINGS_ON_DETAIL_READ brings back
+# the old behaviour of pairing the next round there. Instead the next round is
+# started by the pairings endpoint, or with PAIRINGS_ON_ROUND_FINISHED when
+# the last score of a round is submitted. The latter pairs inside that request
+# in the 'sync' PAIRING_JOBS_MODE, so turn it on with 'thread' or 'worker'.
+PAIRINGS_ON_DETAIL_READ = False
+PAIRINGS_ON_ROUND_FINISHED = False
+
+# Players, tournaments and matches lists are paginated with ?after=<id>&limit=
+# when the request asks for it. PAGINATE_LISTS = True paginates them always;
+# it stays off for clients that expect the whole list.
+PAGINATE_LISTS = False
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Lists requested with ?stream=1 are loaded and sent this many rows at a time.
+STREAM_CHUNK_SIZE = 500
+
+# Tournament detail and standings responses are cached per tournament version.
+# Any cache backend works, e.g. memcached:
+# 'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+# 'LOCATION': '127.0.0.1:11211',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# The version is read from the database on every request, so a per-process
+# cache never serves a payload of an older version.
+TOURNAMENT_CACHE_TTL = 300
+
+# Tokens checked by is_authorized are kept in memory of each process; logout
+# revokes them at once in its own process and within the TTL in the others.
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60
+
+# 'table' - login saves a Token row per sign-in (the original behaviour)
+# 'signed' - login returns HMAC signed tokens checked without the database;
+#     Token uuids issued before keep working
+# 'signed_only' - only signed tokens are accepted
+# Signed tokens are revoked by logout through AUTH_TOKEN_REVOCATION_CACHE,
+# which must be shared by all processes (e.g. memcached, see CACHES); the
+# signed modes refuse to start with locmem. Add a new key id to
+# AUTH_TOKEN_KEYS to rotate keys.
+AUTH_TOKEN_MODE = 'table'
+AUTH_TOKEN_REVOCATION_CACHE = 'default'
+AUTH_TOKEN_KEY_ID = 'k1'
+AUTH_TOKEN_KEYS = {'k1': SECRET_KEY}
+AUTH_TOKEN_MAX_AGE = 14 * 24 * 60 * 60  # seconds
+
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# At most PASSWORD_HASHING_SLOTS passwords are hashed or checked at a time by
+# all processes together; the slots are kept in CACHES[PASSWORD_HASHING_CACHE],
+# which must be shared by the processes (with locmem the limit is per process)
+# and a slot of a dead process frees itself after PASSWORD_HASHING_SLOT_TIMEOUT
+# seconds. 0 slots disables the limit.
+# Within a process hashing runs on a pool of PASSWORD_HASHING_THREADS threads
+# with at most PASSWORD_HASHING_QUEUE calls waiting for it; that limit only
+# fills up with threaded workers. 0 threads hashes on the request thread.
+# Login, registration and password reset answer 429 with Retry-After (seconds)
+# while either limit is reached.
+PASSWORD_HASHING_SLOTS = 8
+PASSWORD_HASHING_CACHE = 'default'
+PASSWORD_HASHING_SLOT_TIMEOUT = 10
+PASSWORD_HASHING_THREADS = 4
+PASSWORD_HASHING_QUEUE = 16
+PASSWORD_HASHING_RETRY_AFTER = 1
+
+# Mail
+# Views queue mail in the outbox table; `manage.py send_outbox_mail` sends it
+# in batches of MAIL_BATCH_SIZE over one SMTP connection. A failed mail is
+# retried after MAIL_RETRY_DELAY seconds, doubled on every attempt, until
+# MAIL_MAX_ATTEMPTS. An empty MAIL_SMTP_USER skips the login.
+MAIL_SMTP_HOST = 'smtp.gmail.com'
+MAIL_SMTP_PORT = 587
+MAIL_SMTP_STARTTLS = True
+MAIL_SMTP_USER = 'sending.from.python@gmail.com'
+MAIL_SMTP_PASSWORD = os.environ.get('MAIL_SMTP_PASSWORD', 'gmail9393')
+MAIL_SMTP_TIMEOUT = 30
+MAIL_FROM = MAIL_SMTP_USER
+MAIL_BATCH_SIZE = 50
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_DELAY = 60
+# Addresses accepted by one send_invitation/ request
+MAX_INVITATIONS = 1000
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
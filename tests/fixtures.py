@@ -1,3 +1,5 @@
+from django.contrib.auth.hashers import make_password
+
 from event_organizer.models import Player, Tournament, Match
 
 #
@@ -17,6 +19,22 @@ def gen_player(
 
     return player
 
+def gen_players(count, password="P@ssw0rd!"):
+    # "Player 0", "Player 1", ... saved with one INSERT and one password hash
+    password_hashed = make_password(password)
+    emails = [f"player{i}@false.com" for i in range(count)]
+    Player.objects.bulk_create([
+        Player(
+            first_name="Player",
+            last_name=str(i),
+            email=email,
+            _password=password_hashed,
+        )
+        for i, email in enumerate(emails)
+    ])
+
+    return list(Player.objects.filter(email__in=emails).order_by('id'))
+
 def gen_tournament(
         name='test tournament 1',
         date_beginning='2018-12-17 10:00:00',
@@ -0,0 +1,307 @@
+import json
+import threading
+from time import time
+
+from rest_framework import status
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+
+from event_organizer.decorators import hashing_backpressure, is_authorized
+from event_organizer.hashing import HashingBusy, HashingPool, SharedSlots
+from event_organizer.models import Token
+from event_organizer.tokens import (
+    TokenCache, check_revocation_cache, revoke_signed_token, sign_token,
+    token_cache, verify_signed_token)
+
+from tests.fixtures import gen_player
+
+client = Client()
+BASE_URL='//127.0.0.1:8000'
+
+
+@is_authorized
+def protected_view(request):
+    return HttpResponse(status=200)
+
+
+busy_pool = HashingPool(threads=1, queue=0)
+
+
+@hashing_backpressure
+def hashing_view(request):
+    busy_pool.run(len, 'P@ssw0rd!')
+    return HttpResponse(status=200)
+
+
+class TestIsAuthorized(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.player = gen_player()
+        self.token = Token(player=self.player)
+        self.token.save()
+        self.header = f'{self.player.id}:{self.token.uuid}'
+        self.factory = RequestFactory()
+
+    def call(self, header):
+        return protected_view(
+            self.factory.get('/', HTTP_AUTHORIZATION=header))
+
+    def test_valid_token_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.call(self.header).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.call(self.header).status_code, 200)
+
+    def test_wrong_player(self):
+        response = self.call(f'{self.player.id + 1}:{self.token.uuid}')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_malformed_header(self):
+        response = self.call('no-colon')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_token(self):
+        self.token.is_expired = True
+        self.token.save()
+
+        response = self.call(self.header)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_cached_token(self):
+        self.call(self.header)
+        response = client.get(
+            f'{BASE_URL}/events/logout/', HTTP_AUTHORIZATION=self.header)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        with self.assertNumQueries(0):
+            response = self.call(self.header)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestTokenCache(TestCase):
+
+    def test_least_recently_used_dropped(self):
+        cache = TokenCache(size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), (1, False))
+        self.assertIsNone(cache.get('b'))
+
+    def test_entries_expire(self):
+        cache = TokenCache(size=2, ttl=-1)
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+
+class TestHashingPool(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_runs_on_pool(self):
+        pool = HashingPool(threads=2, queue=0)
+
+        name = pool.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('password-hashing'))
+
+    def test_full_pool_rejects(self):
+        pool = HashingPool(threads=1, queue=1)
+        release = threading.Event()
+        running = pool.submit(release.wait)
+        waiting = pool.submit(release.wait)
+
+        with self.assertRaises(HashingBusy):
+            pool.run(len, 'P@ssw0rd!')
+
+        release.set()
+        running.result()
+        waiting.result()
+        self.assertEqual(pool.run(len, 'P@ssw0rd!'), 9)
+
+    def test_no_threads_runs_inline(self):
+        pool = HashingPool(threads=0, queue=0)
+
+        name = pool.run(lambda: threading.current_thread().name)
+
+        self.assertEqual(name, threading.current_thread().name)
+
+    def test_shared_slots_limit_all_processes(self):
+        # pools of two processes sharing one cache
+        pools = [
+            HashingPool(threads=0, queue=0, shared_slots=SharedSlots(size=1))
+            for process in range(2)
+        ]
+        slot = pools[0].shared_slots.acquire()
+
+        with self.assertRaises(HashingBusy):
+            pools[1].run(len, 'P@ssw0rd!')
+
+        pools[0].shared_slots.release(slot)
+        self.assertEqual(pools[1].run(len, 'P@ssw0rd!'), 9)
+
+    def test_expired_slot_not_released_by_old_owner(self):
+        slots = SharedSlots(size=1)
+        slot = slots.acquire()
+        # expired and taken by another process
+        cache.set(slot[0], 'other-owner')
+
+        slots.release(slot)
+
+        self.assertEqual(cache.get(slot[0]), 'other-owner')
+
+    @override_settings(PASSWORD_HASHING_SLOTS=0)
+    def test_threaded_workers(self):
+        # Without shared slots the limit is the pool of the process, which
+        # fills up only when the process serves requests on several threads
+        pool = HashingPool(threads=1, queue=1)
+        release = threading.Event()
+        responses = []
+
+        @hashing_backpressure
+        def view(request):
+            pool.run(release.wait)
+            return HttpResponse(status=200)
+
+        def worker():
+            responses.append(view(RequestFactory().post('/')).status_code)
+
+        workers = [threading.Thread(target=worker) for i in range(4)]
+        for thread in workers:
+            thread.start()
+        while len(responses) < 2:
+            release.wait(0.01)
+        release.set()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(sorted(responses), [200, 200, 429, 429])
+
+    def test_backpressure(self):
+        factory = RequestFactory()
+        release = threading.Event()
+        running = busy_pool.submit(release.wait)
+
+        response = hashing_view(factory.post('/'))
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1')
+
+        release.set()
+        running.result()
+        self.assertEqual(hashing_view(factory.post('/')).status_code, 200)
+
+
+@override_settings(AUTH_TOKEN_MODE='signed')
+class TestSignedTokens(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        # revocations of other tests
+        cache.clear()
+        self.player = gen_player()
+        self.token = sign_token(self.player.id)
+        self.header = f'{self.player.id}:{self.token}'
+        self.factory = RequestFactory()
+
+    def call(self, header):
+        return protected_view(
+            self.factory.get('/', HTTP_AUTHORIZATION=header))
+
+    def test_verified_without_database(self):
+        with self.assertNumQueries(0):
+            response = self.call(self.header)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_tampered_token(self):
+        other_player = self.token.replace(
+            f'.{self.player.id}.', f'.{self.player.id + 1}.')
+
+        self.assertIsNone(verify_signed_token(other_player))
+        self.assertEqual(
+            self.call(f'{self.player.id + 1}:{other_player}').status_code,
+            status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_only_its_session(self):
+        other_token = sign_token(self.player.id, issued_at=int(
+            self.token.split('.')[3]))
+
+        self.assertNotEqual(other_token, self.token)
+        revoke_signed_token(self.token)
+        self.assertIsNone(verify_signed_token(self.token))
+        self.assertEqual(verify_signed_token(other_token), self.player.id)
+
+    def test_revocations_need_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_revocation_cache()
+
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'cache'}}):
+            check_revocation_cache()
+
+        with override_settings(AUTH_TOKEN_MODE='table'):
+            check_revocation_cache()
+
+    @override_settings(AUTH_TOKEN_MAX_AGE=60)
+    def test_expired_token(self):
+        token = sign_token(self.player.id, issued_at=int(time()) - 61)
+
+        self.assertIsNone(verify_signed_token(token))
+
+    def test_unknown_key_id(self):
+        with override_settings(
+                AUTH_TOKEN_KEY_ID='k2', AUTH_TOKEN_KEYS={'k2': 'old'}):
+            token = sign_token(self.player.id)
+
+        self.assertIsNone(verify_signed_token(token))
+
+    def test_table_token_still_accepted(self):
+        token = Token(player=self.player)
+        token.save()
+
+        response = self.call(f'{self.player.id}:{token.uuid}')
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(AUTH_TOKEN_MODE='signed_only')
+    def test_table_token_rejected_in_signed_only_mode(self):
+        token = Token(player=self.player)
+        token.save()
+
+        response = self.call(f'{self.player.id}:{token.uuid}')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_and_logout(self):
+        response = client.post(
+            f'{BASE_URL}/events/login/',
+            data=json.dumps(
+                {"email": self.player.email, "password": "P@ssw0rd!"}),
+            content_type='application/json'
+        )
+        token = response.json()['uuid']
+        header = f'{self.player.id}:{token}'
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(self.call(header).status_code, 200)
+
+        response = client.get(
+            f'{BASE_URL}/events/logout/', HTTP_AUTHORIZATION=header)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.call(header).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,9 +1,14 @@
-from sys import exit  # Pure Python imports
+from io import StringIO  # Pure Python imports
+from sys import exit
 
 from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
 from django.test import TestCase  # 3rd party libs
 
-from event_organizer.models import Player  # our code
+from event_organizer.models import (  # our code
+    Player, Tournament, Match, PlayerStanding)
+from event_organizer.scores import standings_from_totals
+from tests.fixtures import gen_players, gen_tournament
 
 
 class TestPlayerModel(TestCase):
@@ -31,3 +36,369 @@ class TestPlayerModel(TestCase):
         result = self.player.check_password("new_pass")
 
         self.assertTrue(result)
+
+
+class TestPlayerTournaments(TestCase):
+
+    def setUp(self):
+        self.players = gen_players(2)
+        # name: [(round, finished), ...]
+        tournaments = {
+            'upcoming': [],
+            'first round': [(1, False)],
+            'second round': [(1, True), (2, False)],
+            'finished': [(1, True)],
+        }
+        self.tournaments = {}
+        for name, rounds in tournaments.items():
+            tournament = gen_tournament(name=name)
+            tournament.players.set(self.players)
+            Match.save_all([
+                Match(
+                    player_1=self.players[0],
+                    player_2=self.players[1],
+                    tournament=tournament,
+                    player_1_score=2 if finished else 0,
+                    player_2_score=0,
+                    draws=0,
+                    round=round_num
+                )
+                for round_num, finished in rounds
+            ])
+            self.tournaments[name] = Tournament.objects.get(id=tournament.id)
+
+    def test_current_tournaments(self):
+        with self.assertNumQueries(2):
+            tournaments = self.players[0].get_current_tournaments()
+            names = {tournament.name for tournament in tournaments}
+
+        expected = {
+            tournament.name for tournament in self.tournaments.values()
+            if not tournament.is_finished
+        }
+        self.assertEqual(names, expected)
+
+    def test_player_history(self):
+        with self.assertNumQueries(1):
+            tournaments = self.players[0].get_player_history()
+            names = {tournament.name for tournament in tournaments}
+
+        expected = {
+            tournament.name for tournament in self.tournaments.values()
+            if tournament.past_rounds
+        }
+        self.assertEqual(names, expected)
+        self.assertEqual(names, {'second round', 'finished'})
+
+
+class TestTournamentScores(TestCase):
+
+    def setUp(self):
+        self.tournament = gen_tournament()
+        self.players = gen_players(4)
+        self.tournament.players.set(self.players)
+        results = [
+            # player_1, player_2, player_1_score, player_2_score, draws, round
+            (0, 1, 2, 0, 0, 1),
+            (2, 3, 1, 1, 1, 1),
+            (0, 2, 0, 2, 0, 2),
+            (1, None, 2, 0, 0, 2),  # bye
+            (3, 1, 0, 0, 0, 3),  # not finished
+        ]
+        for p1, p2, score_1, score_2, draws, round_num in results:
+            Match(
+                player_1=self.players[p1],
+                player_2=self.players[p2] if p2 is not None else None,
+                tournament=self.tournament,
+                player_1_score=score_1,
+                player_2_score=score_2,
+                draws=draws,
+                round=round_num
+            ).save()
+
+    def test_snapshot_matches_score_in_tournament(self):
+        snapshot = self.tournament.score_snapshot()
+
+        for player in self.players:
+            self.assertEqual(
+                snapshot.points(player.id),
+                player.get_score_in_tournament(self.tournament.id)
+            )
+
+    def test_score_by_player_id(self):
+        self.assertEqual(
+            self.tournament.score_by_player_id(self.players[2].id), 4)
+
+    def test_standings_query_count(self):
+        with self.assertNumQueries(1):
+            standings = self.tournament.standings
+
+        self.assertEqual(
+            [row["score"] for row in standings], [4, 3, 3, 1])
+
+    def test_standings_tiebreakers(self):
+        standings = self.tournament.standings
+        ids = [self.players[i].id for i in (2, 0, 1, 3)]
+
+        # equal points of players 0 and 1 are decided by OMW%
+        self.assertEqual([row["id"] for row in standings], ids)
+        self.assertEqual(standings[1]["omw_percentage"], 58.33)
+        self.assertEqual(standings[1]["gw_percentage"], 50.0)
+        self.assertEqual(standings[1]["ogw_percentage"], 58.33)
+        # bye doesn't count as an opponent
+        self.assertEqual(standings[2]["omw_percentage"], 50.0)
+        self.assertEqual(standings[3]["omw_percentage"], 66.67)
+        self.assertEqual(standings[3]["gw_percentage"], 44.44)
+
+    def test_standings_percentage_floor(self):
+        # matches: 1-2 2:0, 3-4 2:1, 1-3 2:0, 2-4 2:0
+        totals = [
+            # id, points, wins, losses, games won, games lost, opponents
+            (1, 6, 2, 0, 4, 0, '2,3'),
+            (2, 3, 1, 1, 2, 2, '1,4'),
+            (3, 3, 1, 1, 2, 3, '4,1'),
+            (4, 0, 0, 2, 1, 4, '3,2'),
+        ]
+        standings = standings_from_totals([
+            {
+                "id": player_id, "first_name": "Player",
+                "last_name": str(player_id), "points": points, "wins": wins,
+                "losses": losses, "draws": 0, "games_won": games_won,
+                "games_lost": games_lost, "games_drawn": 0,
+                "opponents": opponents,
+            }
+            for player_id, points, wins, losses, games_won, games_lost,
+            opponents in totals
+        ])
+        by_id = {row["id"]: row for row in standings}
+
+        # player 4 lost both matches, their 0% counts as 33%
+        self.assertEqual(by_id[2]["omw_percentage"], 66.5)
+        self.assertEqual(by_id[4]["gw_percentage"], 33.0)
+
+
+class TestTournamentRoundState(TestCase):
+
+    def setUp(self):
+        self.tournament = gen_tournament()
+        self.players = gen_players(4)
+        self.tournament.players.set(self.players)
+        self.matches = [
+            Match(
+                player_1=self.players[i],
+                player_2=self.players[i + 1],
+                tournament=self.tournament,
+                player_1_score=0,
+                player_2_score=0,
+                draws=0,
+                round=1
+            )
+            for i in (0, 2)
+        ]
+        for match in self.matches:
+            match.save()
+
+    def score(self, match):
+        match = Match.objects.get(id=match.id)
+        match.player_1_score = 2
+        match.save()
+
+    def test_new_round(self):
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tournament.round_number_next, 1)
+            self.assertFalse(tournament.is_current_round_finished)
+        self.assertEqual(len(tournament.current_round), 2)
+
+    def test_round_finished_after_last_score(self):
+        self.score(self.matches[0])
+        self.assertFalse(
+            Tournament.objects.get(id=self.tournament.id)
+            .is_current_round_finished)
+
+        self.score(self.matches[1])
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        self.assertTrue(tournament.is_current_round_finished)
+        self.assertEqual(tournament.round_number_next, 2)
+        self.assertEqual(len(tournament.past_rounds), 2)
+
+    def test_delete_unfinished_match(self):
+        self.score(self.matches[0])
+        Match.objects.get(id=self.matches[1].id).delete()
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        self.assertTrue(tournament.is_current_round_finished)
+        self.assertEqual(tournament.last_round, 1)
+
+    def test_player_delete_updates_round_state(self):
+        self.score(self.matches[1])
+        self.players[0].delete()
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        self.assertFalse(tournament.matches.filter(
+            id=self.matches[0].id).exists())
+        self.assertEqual(tournament.unfinished_matches, 0)
+        self.assertTrue(tournament.is_current_round_finished)
+
+    def test_stale_match_copies_counted_once(self):
+        # e.g. both players reporting the score of the same match
+        first = Match.objects.get(id=self.matches[0].id)
+        second = Match.objects.get(id=self.matches[0].id)
+        first.player_1_score = 2
+        first.save()
+        second.player_1_score = 2
+        second.save()
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        self.assertEqual(tournament.unfinished_matches, 1)
+        self.assertFalse(tournament.is_current_round_finished)
+
+    def test_stale_instance_save_keeps_round_state(self):
+        stale = Tournament.objects.get(id=self.tournament.id)
+        self.score(self.matches[0])
+        self.score(self.matches[1])
+        stale.name = 'renamed'
+        stale.save()
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        self.assertEqual(tournament.name, 'renamed')
+        self.assertEqual(tournament.unfinished_matches, 0)
+
+    def test_rebuild_round_state(self):
+        version = Tournament.current_version(self.tournament.id)
+        Match.objects.update(player_1_score=2)
+        Tournament.rebuild_round_state(self.tournament.id)
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        self.assertEqual(tournament.last_round, 1)
+        self.assertEqual(tournament.unfinished_matches, 0)
+        self.assertGreater(tournament.version, version)
+
+
+class TestTournamentState(TestCase):
+
+    def setUp(self):
+        player_dicts = [
+            {"first_name": "John", "last_name": "Fryc", "email": "a@a.com"},
+            {"first_name": "Jan", "last_name": "Kos", "email": "b@b.com"},
+        ]
+        self.tournament = gen_tournament(player_dicts=player_dicts)
+        self.player_1, self.player_2 = self.tournament.players.all()
+        self.match = Match(
+            player_1=self.player_1,
+            player_2=self.player_2,
+            tournament=self.tournament,
+            player_1_score=0,
+            player_2_score=0,
+            draws=0,
+            round=1
+        )
+        self.match.save()
+
+    def test_matches_loaded_once(self):
+        tournament = Tournament.objects.get(id=self.tournament.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(tournament.current_round), 1)
+            self.assertEqual(len(tournament.past_rounds), 0)
+            self.assertEqual(tournament.round_number_next, 1)
+            self.assertEqual(tournament.past_round_pairings, [])
+
+    def test_invalidated_by_match_save(self):
+        self.assertEqual(len(self.tournament.current_round), 1)
+        self.match.player_1_score = 2
+        self.match.save()
+
+        self.assertEqual(len(self.tournament.current_round), 0)
+        self.assertEqual(len(self.tournament.past_rounds), 1)
+
+    def test_explicit_invalidation(self):
+        self.assertEqual(len(self.tournament.state().players), 2)
+        self.tournament.players.remove(self.player_2)
+        self.tournament.invalidate_state()
+
+        self.assertEqual(len(self.tournament.state().players), 1)
+
+
+class TestPlayerStanding(TestCase):
+
+    def setUp(self):
+        self.tournament = gen_tournament()
+        self.players = gen_players(2)
+        self.tournament.players.set(self.players)
+        self.match = Match(
+            player_1=self.players[0],
+            player_2=self.players[1],
+            tournament=self.tournament,
+            player_1_score=0,
+            player_2_score=0,
+            draws=0,
+            round=1
+        )
+        self.match.save()
+
+    def standing(self, i):
+        return PlayerStanding.objects.get(
+            tournament=self.tournament, player=self.players[i])
+
+    def test_unfinished_match_not_counted(self):
+        self.assertFalse(PlayerStanding.objects.exists())
+
+    def test_score_update_applies_difference(self):
+        self.match.player_1_score = 2
+        self.match.save()
+        match = Match.objects.get(id=self.match.id)
+        match.player_1_score = 1
+        match.player_2_score = 2
+        match.save()
+
+        standing_0 = self.standing(0)
+        standing_1 = self.standing(1)
+        self.assertEqual((standing_0.points, standing_0.losses), (0, 1))
+        self.assertEqual((standing_1.points, standing_1.wins), (3, 1))
+        self.assertEqual(standing_1.games_won, 2)
+        self.assertEqual(standing_1.opponents, str(self.players[0].id))
+
+    def test_stale_match_copies_counted_once(self):
+        first = Match.objects.get(id=self.match.id)
+        second = Match.objects.get(id=self.match.id)
+        first.player_1_score = 2
+        first.save()
+        second.player_1_score = 2
+        second.save()
+
+        standing_0 = self.standing(0)
+        self.assertEqual((standing_0.points, standing_0.wins), (3, 1))
+        self.assertEqual(standing_0.opponents, str(self.players[1].id))
+
+    def test_delete_takes_result_back(self):
+        self.match.player_1_score = 2
+        self.match.save()
+        Match.objects.get(id=self.match.id).delete()
+
+        self.assertEqual(self.standing(0).points, 0)
+        self.assertEqual(self.standing(0).opponents, '')
+
+    def test_player_delete_takes_results_back(self):
+        self.match.player_1_score = 2
+        self.match.save()
+        self.players[1].delete()
+
+        self.assertFalse(PlayerStanding.objects.filter(
+            tournament=self.tournament).exists())
+        self.assertEqual(self.tournament.score_by_player_id(
+            self.players[0].id), 0)
+
+    def test_rebuild(self):
+        self.match.player_1_score = 2
+        self.match.save()
+        PlayerStanding.objects.update(points=100)
+        version = Tournament.current_version(self.tournament.id)
+        call_command('rebuild_standings', stdout=StringIO())
+
+        self.assertEqual(self.standing(0).points, 3)
+        self.assertEqual(self.standing(1).points, 0)
+        self.assertGreater(
+            Tournament.current_version(self.tournament.id), version)
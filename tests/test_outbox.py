@@ -0,0 +1,269 @@
+import asyncore
+import json
+import smtpd
+import smtplib
+import threading
+from datetime import timedelta
+
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from event_organizer.models import CreateAccountToken, OutboxMail
+from player_services.outbox import OutboxSender
+from player_services.services import send_user_register_mail
+
+from tests.fixtures import gen_player
+
+client = Client()
+BASE_URL='//127.0.0.1:8000'
+
+
+class FakeConnection:
+    """ smtplib.SMTP stand-in recording sent mails. """
+
+    def __init__(self, errors=()):
+        self.sent = []
+        self.errors = list(errors)
+        self.closed = False
+
+    def sendmail(self, from_addr, to_addrs, message):
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append(to_addrs[0])
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
+
+
+class LocalSMTPServer(smtpd.SMTPServer):
+    """ SMTP server on a random local port, counting connections. """
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.connections = 0
+        self.messages = []
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        super().handle_accepted(conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        self.messages.append(rcpttos[0])
+
+
+def queue_mails(count):
+    return [
+        send_user_register_mail(f'player{i}@false.com', f'token-{i}')
+        for i in range(count)
+    ]
+
+
+class TestOutboxViews(TestCase):
+
+    def test_register_request_queues_mail(self):
+        response = client.post(
+            f'{BASE_URL}/events/register_request/',
+            data=json.dumps({"email": "new.player@false.com"}),
+            content_type='application/json'
+        )
+        mail = OutboxMail.objects.get()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mail.to_email, 'new.player@false.com')
+        self.assertEqual(mail.status, OutboxMail.QUEUED)
+
+
+class TestSendInvitation(TestCase):
+
+    def post(self, data):
+        return client.post(
+            f'{BASE_URL}/events/send_invitation/',
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+
+    def test_bulk_invitation(self):
+        player = gen_player()
+        emails = [f'player{i}@false.com' for i in range(50)]
+
+        # players lookup, tokens and mails inserts, savepoint and release
+        with self.assertNumQueries(5):
+            response = self.post({
+                "emails": emails + [
+                    player.email, 'not an email', emails[0]]
+            })
+        results = response.json()['results']
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['invited'] * 50 + ['exists', 'invalid', 'duplicate'])
+        self.assertEqual(
+            set(CreateAccountToken.objects.values_list('email', flat=True)),
+            set(emails))
+        self.assertEqual(
+            set(OutboxMail.objects.values_list('to_email', flat=True)),
+            set(emails))
+
+    def test_nobody_invited(self):
+        player = gen_player()
+
+        response = self.post({"emails": [player.email]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()['results'],
+            [{"email": player.email, "status": "exists"}])
+        self.assertFalse(OutboxMail.objects.exists())
+
+    @override_settings(MAX_INVITATIONS=2)
+    def test_too_many_emails(self):
+        response = self.post({"emails": ['a@a.com', 'b@b.com', 'c@c.com']})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CreateAccountToken.objects.exists())
+
+    def test_body_not_an_object(self):
+        for data in (5, "emails", ["a@a.com"]):
+            response = self.post(data)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_single_email(self):
+        response = self.post({"email": "new.player@false.com"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['email'], 'new.player@false.com')
+        self.assertEqual(OutboxMail.objects.count(), 1)
+
+
+class TestOutboxSender(TestCase):
+
+    def setUp(self):
+        self.connections = []
+
+    def connect(self, errors=()):
+        connection = FakeConnection(errors)
+        self.connections.append(connection)
+        return connection
+
+    def test_batch_reuses_connection(self):
+        queue_mails(3)
+        sender = OutboxSender(connect=self.connect, batch_size=2)
+
+        self.assertEqual(sender.send_batch(), (2, 0))
+        self.assertEqual(sender.send_batch(), (1, 0))
+        self.assertEqual(sender.send_batch(), (0, 0))
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(len(self.connections[0].sent), 3)
+        self.assertEqual(
+            OutboxMail.objects.filter(status=OutboxMail.SENT).count(), 3)
+
+    def test_refused_mail_retried_later(self):
+        mail, other_mail = queue_mails(2)
+        sender = OutboxSender(
+            connect=lambda: self.connect(
+                [smtplib.SMTPRecipientsRefused({}), None]))
+
+        self.assertEqual(sender.send_batch(), (1, 1))
+        mail.refresh_from_db()
+        self.assertEqual(mail.status, OutboxMail.QUEUED)
+        self.assertEqual(mail.attempts, 1)
+        self.assertGreater(mail.send_after, timezone.now())
+        # the connection is kept for the next mail
+        self.assertEqual(len(self.connections), 1)
+
+        OutboxMail.objects.filter(id=mail.id).update(
+            send_after=timezone.now())
+        self.assertEqual(sender.send_batch(), (1, 0))
+        mail.refresh_from_db()
+        self.assertEqual(mail.status, OutboxMail.SENT)
+
+    @override_settings(MAIL_MAX_ATTEMPTS=2)
+    def test_failed_after_max_attempts(self):
+        mail, = queue_mails(1)
+        sender = OutboxSender(
+            connect=lambda: self.connect([OSError('connection reset')]))
+
+        for attempt in range(2):
+            OutboxMail.objects.filter(id=mail.id).update(
+                send_after=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(sender.send_batch(), (0, 1))
+
+        mail.refresh_from_db()
+        self.assertEqual(mail.status, OutboxMail.FAILED)
+        self.assertEqual(mail.attempts, 2)
+        # broken connections are dropped
+        self.assertEqual(len(self.connections), 2)
+
+    def test_unexpected_error_fails_mail(self):
+        mail, other_mail = queue_mails(2)
+        sender = OutboxSender(connect=self.connect)
+        sender._connection = FakeConnection([ValueError('bad address')])
+
+        self.assertEqual(sender.send_batch(), (1, 1))
+        mail.refresh_from_db()
+        other_mail.refresh_from_db()
+        self.assertEqual(mail.status, OutboxMail.FAILED)
+        self.assertEqual(other_mail.status, OutboxMail.SENT)
+        # the connection is dropped, it may be in the middle of a command
+        self.assertEqual(len(self.connections), 1)
+
+    def test_reconnects_after_idle_disconnect(self):
+        queue_mails(1)
+        sender = OutboxSender(connect=self.connect)
+        sender._connection = FakeConnection(
+            [smtplib.SMTPServerDisconnected()])
+
+        self.assertEqual(sender.send_batch(), (1, 0))
+        self.assertEqual(len(self.connections), 1)
+
+
+@override_settings(
+    MAIL_SMTP_HOST='127.0.0.1', MAIL_SMTP_STARTTLS=False, MAIL_SMTP_USER='',
+    MAIL_FROM='events@false.com')
+class TestOutboxSenderSMTP(TestCase):
+
+    def setUp(self):
+        self.server = LocalSMTPServer()
+        self.thread = threading.Thread(
+            target=asyncore.loop, kwargs={'timeout': 0.05})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.close()
+        self.thread.join()
+
+    def test_one_connection_for_all_mails(self):
+        queue_mails(5)
+
+        with self.settings(MAIL_SMTP_PORT=self.server.port):
+            sender = OutboxSender(batch_size=2)
+            while sender.send_batch() != (0, 0):
+                pass
+            sender.close()
+
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_non_ascii_address(self):
+        mail = send_user_register_mail('a@ex\u00e4mple.com', 'token')
+        other_mail, = queue_mails(1)
+
+        with self.settings(MAIL_SMTP_PORT=self.server.port):
+            sender = OutboxSender()
+            self.assertEqual(sender.send_batch(), (1, 1))
+            sender.close()
+
+        mail.refresh_from_db()
+        other_mail.refresh_from_db()
+        self.assertEqual(mail.status, OutboxMail.FAILED)
+        self.assertEqual(other_mail.status, OutboxMail.SENT)
+        self.assertEqual(self.server.messages, [other_mail.to_email])
@@ -0,0 +1,259 @@
+from datetime import timedelta
+from io import StringIO
+
+from rest_framework import status
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+
+from event_organizer.models import Tournament, Match, PairingJob
+from event_organizer.pairing_engine import OpponentIndex, weighted_pairings
+from event_organizer.pairing_view import (
+    generate_matches, claim_pairing_job, run_pairing_job,
+    check_unique_pairings, pair_next_round)
+
+from tests.fixtures import gen_tournament
+
+client = Client()
+BASE_URL='//127.0.0.1:8000'
+
+
+class TestOpponentIndex(TestCase):
+
+    def setUp(self):
+        self.index = OpponentIndex([[1, 2], [3, None]])
+
+    def test_has_played_either_order(self):
+        self.assertTrue(self.index.has_played(1, 2))
+        self.assertTrue(self.index.has_played(2, 1))
+        self.assertFalse(self.index.has_played(1, 3))
+
+    def test_had_bye(self):
+        self.assertTrue(self.index.had_bye(3))
+        self.assertFalse(self.index.had_bye(1))
+        self.assertIn([3], self.index)
+
+    def test_add_pairings(self):
+        self.index.add_pairings([[1, 3], [2]])
+
+        self.assertTrue(self.index.has_played(3, 1))
+        self.assertTrue(self.index.had_bye(2))
+
+    def test_check_unique_pairings(self):
+        unique, duplicates = check_unique_pairings(
+            [[4, 5], [2, 1], [3]], self.index)
+
+        self.assertFalse(unique)
+        self.assertEqual(duplicates, [1, 2])
+
+
+class TestWeightedPairings(TestCase):
+
+    def test_every_player_paired_once(self):
+        scores = {player_id: 0 for player_id in range(1, 9)}
+        pairings = weighted_pairings(scores, [])
+        paired_ids = sorted(sum(pairings, []))
+
+        self.assertEqual(len(pairings), 4)
+        self.assertEqual(paired_ids, list(range(1, 9)))
+
+    def test_players_paired_within_score_group(self):
+        scores = {1: 6, 2: 6, 3: 3, 4: 3, 5: 0, 6: 0}
+        pairings = weighted_pairings(scores, [])
+
+        for pair in pairings:
+            self.assertEqual(scores[pair[0]], scores[pair[1]])
+
+    def test_rematch_avoided(self):
+        scores = {1: 3, 2: 3, 3: 0, 4: 0}
+        pairings = weighted_pairings(scores, [[1, 2], [3, 4]])
+
+        for pair in pairings:
+            self.assertNotIn(sorted(pair), [[1, 2], [3, 4]])
+
+    def test_bye_goes_to_lowest_score(self):
+        scores = {1: 6, 2: 6, 3: 3, 4: 3, 5: 0}
+        pairings = weighted_pairings(scores, [])
+
+        self.assertEqual(pairings[-1], [5])
+
+    def test_no_second_bye(self):
+        scores = {1: 6, 2: 6, 3: 3, 4: 3, 5: 0}
+        pairings = weighted_pairings(scores, [[5, None]])
+
+        self.assertEqual(len(pairings[-1]), 1)
+        self.assertNotEqual(pairings[-1], [5])
+
+    def test_big_event_spans_several_blocks(self):
+        scores = {player_id: player_id % 4 * 3 for player_id in range(1, 202)}
+        pairings = weighted_pairings(scores, [])
+        paired_ids = sorted(sum(pairings, []))
+
+        self.assertEqual(paired_ids, list(range(1, 202)))
+        self.assertEqual(len(pairings[-1]), 1)
+
+
+class TestTournamentPairingsView(TestCase):
+
+    def setUp(self):
+        player_dicts = [
+            {"first_name": "John", "last_name": "Fryc", "email": "a@a.com"},
+            {"first_name": "Jan", "last_name": "Kos", "email": "b@b.com"},
+            {"first_name": "Ala", "last_name": "Ma", "email": "c@c.com"},
+        ]
+        self.tournament = gen_tournament(player_dicts=player_dicts)
+
+    def test_pairings_weighted_ok(self):
+        response = client.get(
+            f'{BASE_URL}/events/tournaments/{self.tournament.id}/pairings/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['current_round']), 2)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament).count(), 2)
+
+    def test_pairings_legacy_ok(self):
+        response = client.get(
+            f'{BASE_URL}/events/tournaments/{self.tournament.id}/pairings/'
+            '?strategy=legacy')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament).count(), 2)
+
+    def test_generate_matches_single_insert(self):
+        player_ids = [player.id for player in self.tournament.players.all()]
+        pairings = [[player_ids[0], player_ids[1]], [player_ids[2]]]
+
+        # savepoint, INSERT, standings of the bye: SELECT and INSERT,
+        # round state: UPDATE and reading it back, release savepoint
+        with self.assertNumQueries(7):
+            matches = generate_matches(pairings, self.tournament, 1)
+
+        self.assertEqual(len(matches), 2)
+        self.assertEqual(matches[1].player_1_score, 2)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament, round=1).count(),
+            2
+        )
+
+    def test_pair_next_round_only_once(self):
+        # both requests saw the current round finished before pairing
+        tournament_1 = Tournament.objects.get(id=self.tournament.id)
+        tournament_2 = Tournament.objects.get(id=self.tournament.id)
+
+        matches = pair_next_round(tournament_1, 'weighted')
+        matches_repeated = pair_next_round(tournament_2, 'weighted')
+
+        self.assertEqual(len(matches), 2)
+        self.assertIsNone(matches_repeated)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament).count(), 2)
+
+    def test_pairings_unknown_strategy(self):
+        response = client.get(
+            f'{BASE_URL}/events/tournaments/{self.tournament.id}/pairings/'
+            '?strategy=random')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament).count(), 0)
+
+
+@override_settings(PAIRING_JOBS_MODE='worker')
+class TestPairingJobs(TestCase):
+
+    def setUp(self):
+        player_dicts = [
+            {"first_name": "John", "last_name": "Fryc", "email": "a@a.com"},
+            {"first_name": "Jan", "last_name": "Kos", "email": "b@b.com"},
+        ]
+        self.tournament = gen_tournament(player_dicts=player_dicts)
+        self.url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/pairings/'
+
+    def test_post_enqueues_job(self):
+        response = client.post(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['status'], PairingJob.QUEUED)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament).count(), 0)
+
+    def test_post_reuses_active_job(self):
+        job_id = client.post(self.url).json()['id']
+        response = client.post(self.url)
+
+        self.assertEqual(response.json()['id'], job_id)
+        self.assertEqual(PairingJob.objects.count(), 1)
+
+    def test_job_status_after_run(self):
+        job_id = client.post(self.url).json()['id']
+        job = claim_pairing_job()
+        run_pairing_job(job)
+
+        response = client.get(f'{self.url}jobs/{job_id}/')
+        resp_json = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp_json['status'], PairingJob.FINISHED)
+        self.assertEqual(resp_json['progress'], 100)
+        self.assertEqual(len(resp_json['result']['current_round']), 1)
+
+    def test_run_pairing_jobs_command(self):
+        client.post(self.url)
+        call_command('run_pairing_jobs', '--once', stdout=StringIO())
+
+        self.assertEqual(
+            PairingJob.objects.get().status, PairingJob.FINISHED)
+        self.assertEqual(
+            Match.objects.filter(tournament=self.tournament).count(), 1)
+
+    def test_stale_running_job_failed(self):
+        job_id = client.post(self.url).json()['id']
+        claim_pairing_job()
+        PairingJob.objects.filter(id=job_id).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=301))
+
+        response = client.post(self.url)
+
+        self.assertNotEqual(response.json()['id'], job_id)
+        self.assertEqual(
+            PairingJob.objects.get(id=job_id).status, PairingJob.FAILED)
+
+    @override_settings(PAIRING_JOBS_MODE='thread')
+    def test_stale_queued_job_failed(self):
+        # e.g. the process whose executor had the job was restarted
+        job = PairingJob.objects.create(
+            tournament=self.tournament, strategy='weighted',
+            created_at=timezone.now() - timedelta(seconds=301))
+
+        response = client.post(self.url)
+
+        self.assertNotEqual(response.json()['id'], job.id)
+        self.assertEqual(
+            PairingJob.objects.get(id=job.id).status, PairingJob.FAILED)
+
+    def test_one_active_job_per_tournament(self):
+        client.post(self.url)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PairingJob.objects.create(
+                tournament=self.tournament, strategy='weighted')
+
+    def test_failed_job_hides_traceback(self):
+        client.post(self.url)
+        job = claim_pairing_job()
+        job.strategy = 'missing'
+
+        with self.assertLogs('event_organizer.pairing_view', 'ERROR'):
+            run_pairing_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PairingJob.FAILED)
+        self.assertEqual(job.error, 'Pairings could not be generated')
+
+    def test_job_status_404(self):
+        response = client.get(f'{self.url}jobs/9999/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
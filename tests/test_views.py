@@ -1,7 +1,8 @@
 import json
 
 from rest_framework import status
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.db.utils import IntegrityError
 
 from event_organizer.models import Player, Tournament, Match
@@ -9,7 +10,7 @@ from event_organizer.serializers import (
     GetPlayerSerializer, TournamentListSerializer, TournamentDetailSerializer,
     MatchDetailSerializer, MatchListSerializer, AddPlayersToTournamentSerializer)
 
-from tests.fixtures import gen_player, gen_tournament
+from tests.fixtures import gen_player, gen_players, gen_tournament
 
 client = Client()
 BASE_URL='//127.0.0.1:8000'
@@ -106,6 +107,55 @@ class TestPlayerListViews(TestCase):
         self.assertEqual(response.json(), expected)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_players_list_pages(self):
+        response = client.get(f'{BASE_URL}/events/players/?limit=1')
+        resp_json = response.json()
+
+        self.assertEqual(
+            resp_json['results'],
+            GetPlayerSerializer(self.players[:1], many=True).data)
+        self.assertTrue(resp_json['next'].endswith(
+            f'/events/players/?limit=1&after={self.players[0].id}'))
+
+        response = client.get(resp_json['next'])
+        resp_json = response.json()
+
+        self.assertEqual(
+            resp_json['results'],
+            GetPlayerSerializer(self.players[1:], many=True).data)
+        self.assertIsNone(resp_json['next'])
+
+    @override_settings(STREAM_CHUNK_SIZE=1)
+    def test_players_list_stream(self):
+        response = client.get(f'{BASE_URL}/events/players/?stream=1')
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(
+            json.loads(content),
+            GetPlayerSerializer(self.players, many=True).data)
+
+    def test_players_list_stream_ndjson(self):
+        response = client.get(
+            f'{BASE_URL}/events/players/?stream=1&format=ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            GetPlayerSerializer(self.players, many=True).data)
+
+    @override_settings(PAGINATE_LISTS=True, PAGE_SIZE=50)
+    def test_players_list_paginated_by_setting(self):
+        response = client.get(f'{BASE_URL}/events/players/')
+
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNone(response.json()['next'])
+
+    def test_players_list_invalid_limit(self):
+        response = client.get(f'{BASE_URL}/events/players/?limit=abc')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_players_post_ok(self):
         payload = {
             'first_name': 'Mr',
@@ -222,6 +272,45 @@ class TestTournamentListViews(TestCase):
         self.assertEqual(response_clean_time, expected)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_tournaments_query_count(self):
+        with self.assertNumQueries(1):
+            client.get(f'{BASE_URL}/events/tournaments/')
+
+    def test_tournaments_status_filter(self):
+        players = list(self.tournaments[1].players.all())
+        Match(
+            player_1=players[0],
+            player_2=players[1],
+            tournament=self.tournaments[1],
+            player_1_score=2,
+            player_2_score=0,
+            draws=0,
+            round=1
+        ).save()
+        self.tournaments.append(gen_tournament(name='tournament_test_3'))
+        Match(
+            player_1=players[0],
+            player_2=players[1],
+            tournament=self.tournaments[2],
+            player_1_score=0,
+            player_2_score=0,
+            draws=0,
+            round=1
+        ).save()
+
+        for status_name, index in (
+                ('upcoming', 0), ('finished', 1), ('ongoing', 2)):
+            response = client.get(
+                f'{BASE_URL}/events/tournaments/?status={status_name}')
+            names = [tournament['name'] for tournament in response.json()]
+
+            self.assertEqual(names, [self.tournaments[index].name])
+
+    def test_tournaments_unknown_status(self):
+        response = client.get(f'{BASE_URL}/events/tournaments/?status=past')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_tournaments_post_ok(self):
         payload = {
             "name": "test_post_tournament",
@@ -264,6 +353,7 @@ class TestTournamentListViews(TestCase):
 class TestTournamentDetailViews(TestCase):
 
     def setUp(self):
+        cache.clear()
         player_dict = [{
             "first_name": "John",
             "last_name": "Fryc",
@@ -300,6 +390,17 @@ class TestTournamentDetailViews(TestCase):
         self.assertEqual(response_clean_time, expected)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_tournament_get_does_not_pair(self):
+        client.get(f'{BASE_URL}/events/tournaments/{self.tournament.id}/')
+
+        self.assertEqual(self.tournament.matches.count(), 0)
+
+    @override_settings(PAIRINGS_ON_DETAIL_READ=True)
+    def test_tournament_get_pairs_when_enabled(self):
+        client.get(f'{BASE_URL}/events/tournaments/{self.tournament.id}/')
+
+        self.assertEqual(self.tournament.matches.count(), 1)
+
     def test_tournament_404(self):
         response = client.get(f'{BASE_URL}/events/tournaments/9999/')
 
@@ -555,6 +656,33 @@ class TestMatchDetailView(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def put_last_score(self):
+        tournament = self.match.tournament
+        tournament.rounds_number = 2
+        tournament.save()
+        payload = {
+            "player_1_score": 2,
+            "player_2_score": 0,
+            "draws": 0,
+        }
+        client.put(
+            f'{self.base_url}/{self.match.tournament_id}/matches/{self.match.id}/',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        return tournament
+
+    @override_settings(PAIRINGS_ON_ROUND_FINISHED=True)
+    def test_match_put_last_score_starts_next_round(self):
+        tournament = self.put_last_score()
+
+        self.assertEqual(tournament.matches.filter(round=2).count(), 1)
+
+    def test_match_put_last_score_doesnt_pair_by_default(self):
+        tournament = self.put_last_score()
+
+        self.assertEqual(tournament.matches.filter(round=2).count(), 0)
+
     def test_match_put_400_for_player_score(self):
         payload = {
             "player_1_id": self.match.player_1_id,
@@ -708,3 +836,227 @@ class TestAddPlayersToTournament(TestCase):
         self.assertEqual(len(data['players']), 1)
         self.assertEqual(data['players'][0]["id"], payload["player_ids"][0])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestMatchQueryCounts(TestCase):
+
+    def setUp(self):
+        # cached payloads of other tests' tournaments with the same ids
+        cache.clear()
+        self.tournament = gen_tournament()
+        self.players = gen_players(20)
+        self.tournament.players.set(self.players)
+        # 20 rounds of 10 matches, the last one not finished
+        matches = []
+        for round_num in range(1, 21):
+            for i in range(0, 20, 2):
+                matches.append(Match(
+                    player_1=self.players[i],
+                    player_2=self.players[i + 1],
+                    tournament=self.tournament,
+                    player_1_score=0 if round_num == 20 else 2,
+                    player_2_score=0,
+                    draws=0,
+                    round=round_num
+                ))
+        Match.save_all(matches)
+
+    def test_tournament_detail_200_matches(self):
+        # version for the ETag, tournament, matches with players, players,
+        # standings
+        with self.assertNumQueries(5):
+            response = client.get(
+                f'{BASE_URL}/events/tournaments/{self.tournament.id}/')
+        resp_json = response.json()
+
+        self.assertEqual(len(resp_json['current_round']), 10)
+        self.assertEqual(len(resp_json['past_rounds']), 190)
+        self.assertEqual(
+            resp_json['past_rounds'][0]['player_1_name'], '0, Player')
+
+    def test_match_list_200_matches(self):
+        # version for the ETag, tournament, matches
+        with self.assertNumQueries(3):
+            response = client.get(
+                f'{BASE_URL}/events/tournaments/{self.tournament.id}/matches/')
+
+        self.assertEqual(len(response.json()), 200)
+
+    def test_match_list_page(self):
+        last_id = self.tournament.matches.order_by('id')[99].id
+
+        # version for the ETag, tournament, one page of matches
+        with self.assertNumQueries(3):
+            response = client.get(
+                f'{BASE_URL}/events/tournaments/{self.tournament.id}/matches/'
+                f'?after={last_id}&limit=60')
+        resp_json = response.json()
+
+        self.assertEqual(len(resp_json['results']), 60)
+        self.assertGreater(resp_json['results'][0]['id'], last_id)
+        self.assertIn(
+            f'after={resp_json["results"][-1]["id"]}', resp_json['next'])
+
+    def test_tournament_detail_not_modified(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/'
+        etag = client.get(url)['ETag']
+
+        # only the version is read
+        with self.assertNumQueries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_tournament_detail_cached(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/'
+        expected = client.get(url).json()
+
+        # version, the payload is cached
+        with self.assertNumQueries(1):
+            response = client.get(url)
+
+        self.assertEqual(response.json(), expected)
+
+    def test_tournament_detail_cache_invalidated_by_score(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/'
+        client.get(url)
+        match = self.tournament.matches.get(
+            round=20, player_1=self.players[0])
+        client.put(
+            f'{BASE_URL}/events/tournaments/{self.tournament.id}/'
+            f'matches/{match.id}/',
+            data=json.dumps(
+                {"player_1_score": 2, "player_2_score": 0, "draws": 0}),
+            content_type='application/json'
+        )
+
+        response = client.get(url)
+        current_round = response.json()['current_round']
+        scored = [m for m in current_round if m['id'] == match.id]
+
+        self.assertEqual(scored[0]['player_1_score'], 2)
+
+    def test_tournament_standings(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/standings/'
+        response = client.get(url)
+        resp_json = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp_json['standings'][0]['score'], 57)
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get(url).json(), resp_json)
+
+    def test_tournament_standings_404(self):
+        response = client.get(f'{BASE_URL}/events/tournaments/9999/standings/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_changes_with_score(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/matches/'
+        etag = client.get(url)['ETag']
+        match = self.tournament.matches.order_by('id').first()
+        match.player_2_score = 1  # already finished, round state unchanged
+        match.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_players(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/'
+        etag = client.get(url)['ETag']
+        player = self.players[0]
+        client.put(
+            f'{BASE_URL}/events/players/{player.id}/',
+            data=json.dumps({
+                "first_name": "Renamed",
+                "last_name": player.last_name,
+                "email": player.email,
+            }),
+            content_type='application/json'
+        )
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_player_delete_not_cached(self):
+        url = f'{BASE_URL}/events/tournaments/{self.tournament.id}/standings/'
+        etag = client.get(url)['ETag']
+        player = self.players[0]
+        client.delete(f'{BASE_URL}/events/players/{player.id}/')
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        ids = [row['id'] for row in response.json()['standings']]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(player.id, ids)
+
+    def test_match_detail(self):
+        match = self.tournament.matches.first()
+
+        with self.assertNumQueries(1):
+            response = client.get(
+                f'{BASE_URL}/events/tournaments/{self.tournament.id}/'
+                f'matches/{match.id}/')
+
+        self.assertEqual(response.json()['player_2_name'], '1, Player')
+
+    def test_players_current_tournaments(self):
+        gen_tournament(name='test tournament 2').players.set(self.players)
+
+        # player, tournaments, matches of both tournaments
+        with self.assertNumQueries(3):
+            response = client.get(
+                f'{BASE_URL}/events/players/{self.players[0].id}/'
+                'current_tournaments/')
+
+        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(len(response.json()[0]['current_round']), 10)
+
+
+class TestPlayerHistoryView(TestCase):
+
+    def setUp(self):
+        self.players = gen_players(2)
+        for i in range(10):
+            tournament = gen_tournament(name=f'tournament {i}')
+            tournament.players.set(self.players)
+            Match.save_all([Match(
+                player_1=self.players[0],
+                player_2=self.players[1],
+                tournament=tournament,
+                player_1_score=2 if i % 2 else 1,
+                player_2_score=1,
+                draws=0,
+                round=1
+            )])
+
+    def test_player_history_scores(self):
+        # player, tournaments, scores
+        with self.assertNumQueries(3):
+            response = client.get(
+                f'{BASE_URL}/events/players/{self.players[0].id}/'
+                'player_history/')
+        resp_json = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp_json), 10)
+        self.assertEqual(
+            sorted(tournament['score'] for tournament in resp_json),
+            [1] * 5 + [3] * 5
+        )
+
+    @override_settings(STREAM_CHUNK_SIZE=3)
+    def test_player_history_stream(self):
+        response = client.get(
+            f'{BASE_URL}/events/players/{self.players[0].id}/'
+            'player_history/?stream=1')
+        streamed = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual(len(streamed), 10)
+        self.assertEqual(
+            sorted(tournament['score'] for tournament in streamed),
+            [1] * 5 + [3] * 5
+        )